@@ -0,0 +1,274 @@
+"""Checks for snowbooks_extras against stub Snowflake objects.
+
+Runs outside a notebook: ``snowbook.executor`` is replaced with a stub before
+``snowbooks_extras`` is imported, and sessions are fakes that count the
+queries they are sent. Results are generated lazily, so paging through a
+result of millions of rows reports the notebook-side peak memory and the
+latency per page without holding the rows. Exits non-zero on the first
+failed check.
+
+    python check_snowbooks_extras.py
+    python check_snowbooks_extras.py --rows 20000000
+"""
+import argparse
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import logger as st_logger
+
+VALUE_PAIR = re.compile(r"\('((?:[^']|'')*)', '((?:[^']|'')*)'\)")
+ROW_RANGE = re.compile(r"(\w+) BETWEEN (\d+) AND (\d+)")
+# What the stub executor returns next: a FakeResult.
+STATEMENT_RESULT = []
+
+
+def install_stub_executor():
+    executor = types.SimpleNamespace(
+        run_single_sql_statement=lambda *args, **kwargs: types.SimpleNamespace(
+            query_scan_data_frame=STATEMENT_RESULT[-1]
+        )
+    )
+    package = types.ModuleType("snowbook")
+    module = types.ModuleType("snowbook.executor")
+    module.sql_executor = executor
+    package.executor = module
+    sys.modules.setdefault("snowbook", package)
+    sys.modules.setdefault("snowbook.executor", module)
+
+
+install_stub_executor()
+import snowbooks_extras  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class FakeSigner:
+    """A ``sign`` callable that counts calls and keys."""
+
+    def __init__(self):
+        self.calls = 0
+        self.keys = 0
+
+    def __call__(self, keys):
+        self.calls += 1
+        self.keys += len(keys)
+        return {key: f"https://signed/{key[0]}/{key[1]}?v={self.calls}" for key in keys}
+
+
+class FakeSession:
+    """Answers the signing query by echoing its VALUES rows with a URL."""
+
+    def __init__(self):
+        self.queries = []
+
+    def sql(self, query):
+        self.queries.append(query)
+        rows = [
+            (stage.replace("''", "'"), path.replace("''", "'"), f"https://signed/{stage}/{path}")
+            for stage, path in VALUE_PAIR.findall(query.split("FROM VALUES ", 1)[1])
+        ]
+        return types.SimpleNamespace(collect=lambda: rows)
+
+
+class FakeResult:
+    """A Snowpark-like DataFrame of ``rows`` rows (ID and a FILE column IMG), generated on demand.
+
+    Unsorted reads come back in an arbitrary order, like a re-run query.
+    Only a page read from the materialized result can be converted to pandas.
+    """
+
+    dtypes = [("ID", "bigint"), ("IMG", "file")]
+
+    def __init__(self, rows, session, sql="SELECT ID, IMG FROM FOOD", stats=None):
+        self.rows = rows
+        self.session = session
+        self.queries = {"queries": [sql]}
+        self.stats = stats if stats is not None else {"count": 0, "materialized": 0, "pages": 0}
+        self.materialized = False
+        self.row_range = None
+        self.sorted = False
+
+    def _copy(self, **changes):
+        result = object.__new__(FakeResult)
+        result.__dict__.update(self.__dict__, **changes)
+        return result
+
+    def count(self):
+        self.stats["count"] += 1
+        return self.rows
+
+    def limit(self, n):
+        return self._copy(rows=min(self.rows, n))
+
+    def select_expr(self, expr):
+        return self._copy()
+
+    def cache_result(self):
+        self.stats["materialized"] += 1
+        return self._copy(materialized=True)
+
+    def filter(self, expr):
+        column, first, last = ROW_RANGE.fullmatch(expr).groups()
+        return self._copy(row_range=(int(first), int(last)))
+
+    def sort(self, column):
+        return self._copy(sorted=True)
+
+    def to_pandas(self):
+        if not (self.materialized and self.row_range):
+            raise AssertionError("pages must be read from the materialized result by row range")
+        self.stats["pages"] += 1
+        first, last = self.row_range[0], min(self.row_range[1], self.rows - 1)
+        row = np.arange(first, last + 1)
+        if not self.sorted:
+            row = row[::-1]
+        return pd.DataFrame({
+            "ID": row,
+            "IMG__STAGE": "@FOODIMAGES",
+            "IMG__PATH": [f"img_{i}.jpg" for i in row],
+            "SNOWBOOKS_ROW": row,
+        })
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+    print(f"ok   {message}")
+
+
+def check_url_cache():
+    clock = FakeClock()
+    snowbooks_extras.time = clock
+    cache = snowbooks_extras.PresignedUrlCache(ttl=100)
+    sign = FakeSigner()
+    page = [("@FOODIMAGES", f"img_{i}.jpg") for i in range(25)]
+
+    urls = cache.resolve(page, sign)
+    check(len(urls) == 25 and sign.calls == 1 and sign.keys == 25, "first page: every URL signed in one call")
+    check(cache.stats() == {"signed": 25, "cache_hits": 0, "cached_urls": 25}, "first page: counters")
+
+    clock.now += 50
+    check(cache.resolve(page, sign) == urls and sign.calls == 1, "same page within the TTL: served from cache")
+    check(cache.stats()["cache_hits"] == 25, "same page within the TTL: hits counted")
+
+    next_page = page[20:] + [("@FOODIMAGES", f"img_{i}.jpg") for i in range(25, 45)]
+    cache.resolve(next_page, sign)
+    check(sign.calls == 2 and sign.keys == 45, "overlapping page: only the 20 new URLs signed")
+    check(cache.stats() == {"signed": 45, "cache_hits": 30, "cached_urls": 45}, "overlapping page: counters")
+
+    clock.now += 51
+    expired = cache.resolve(page, sign)
+    check(sign.calls == 3 and sign.keys == 70, "after the TTL: expired URLs signed again")
+    check(all(url.endswith("v=3") for url in expired.values()), "after the TTL: fresh URLs returned")
+    check(cache.resolve([], sign) == {} and sign.calls == 3, "empty page: no signing call")
+
+    check(snowbooks_extras.URL_CACHE_TTL_SECONDS < snowbooks_extras.URL_EXPIRY_SECONDS,
+          "cached URLs expire before Snowflake's")
+
+
+def check_sign_urls():
+    session = FakeSession()
+    keys = [("@FOODIMAGES", f"img_{i}.jpg") for i in range(3)] + [("@FOODIMAGES", "it's.jpg")]
+    urls = snowbooks_extras.sign_urls(session, keys)
+    check(len(session.queries) == 1, "sign_urls: one query for the whole page")
+    check(set(urls) == set(keys), "sign_urls: a URL for every key")
+    check("'it''s.jpg'" in session.queries[0], "sign_urls: quotes are escaped")
+    check(str(snowbooks_extras.URL_EXPIRY_SECONDS) in session.queries[0], "sign_urls: requested expiry")
+
+
+def check_paging(rows, page_size, max_rows):
+    """Page through a lazily generated result; returns (peak MB, per-page seconds)."""
+    result = FakeResult(rows, FakeSession())
+    tracemalloc.start()
+    pager = snowbooks_extras.ResultPager(result, ["IMG"], page_size=page_size, max_rows=max_rows)
+    seconds = []
+    seen = []
+    for index in range(pager.page_count):
+        started = time.perf_counter()
+        page_df = pager.page(index)
+        seconds.append(time.perf_counter() - started)
+        seen.append(page_df["ID"].to_numpy())
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    pager.close()
+
+    ids = np.concatenate(seen)
+    reachable = min(rows, max_rows)
+    check(result.stats["count"] == 1 and result.stats["materialized"] == 1,
+          f"{rows:,} rows: counted and materialized once")
+    check(pager.total_rows == rows and pager.page_count == -(-reachable // page_size),
+          f"{rows:,} rows: total and page count")
+    check(np.array_equal(ids, np.arange(reachable)), f"{rows:,} rows: pages are in order, no row repeated or skipped")
+    check(pager.rows_materialized <= reachable + page_size, f"{rows:,} rows: only browsed pages pulled to the notebook")
+    return peak, seconds
+
+
+def check_reruns():
+    session = FakeSession()
+    STATEMENT_RESULT.append(FakeResult(1_000_000, session))
+    snowbooks_extras.sql_executor.run_single_sql_statement()
+    pagers = st.session_state["snowbooks_pagers"]
+    key = snowbooks_extras._result_key(STATEMENT_RESULT[-1])
+    first = pagers[key]
+    check(first.total_rows == 1_000_000, "statement run: pager shows the result's row count")
+
+    # Turning the page re-runs the cell to redraw it; the statement's result is kept.
+    prefetched = set(first._pages)
+    snowbooks_extras._widget_changed(key)
+    STATEMENT_RESULT.append(FakeResult(1_000_000, session))
+    snowbooks_extras.sql_executor.run_single_sql_statement()
+    stats = STATEMENT_RESULT[-1].stats
+    check(pagers[key] is first and stats["count"] == 0 and stats["materialized"] == 0,
+          "page turn: pager kept, result not counted or materialized again")
+    check(prefetched <= set(first._pages), "page turn: prefetched page kept")
+
+    # The same statement returns different data when it runs again.
+    STATEMENT_RESULT.append(FakeResult(30, session))
+    snowbooks_extras.sql_executor.run_single_sql_statement()
+    second = pagers[key]
+    check(second is not first and second.total_rows == 30, "statement re-run: pager replaced with the new result")
+    check(first._executor._shutdown, "statement re-run: old pager's fetch thread stopped")
+
+    for i in range(snowbooks_extras.MAX_PAGERS + 2):
+        STATEMENT_RESULT.append(FakeResult(10, session, sql=f"SELECT ID, IMG FROM FOOD LIMIT {i}"))
+        snowbooks_extras.sql_executor.run_single_sql_statement()
+    check(len(pagers) == snowbooks_extras.MAX_PAGERS and key not in pagers and second._executor._shutdown,
+          "many statements: only the most recent pagers kept, evicted ones stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000, help="rows in the large stub result")
+    parser.add_argument("--page-size", type=int, default=snowbooks_extras.PAGE_SIZE)
+    args = parser.parse_args()
+    # Widgets run in bare mode here. Load Streamlit's config (which sets the
+    # log level) first, then skip its warning for every widget call.
+    st.get_option("logger.level")
+    st_logger.set_log_level("error")
+
+    check_url_cache()
+    check_sign_urls()
+    check_reruns()
+    for max_rows in (snowbooks_extras.MAX_ROWS, 100_000):
+        peak, seconds = check_paging(args.rows, args.page_size, max_rows)
+        print(f"     {args.rows:,} rows, {len(seconds):,} pages of {args.page_size} (max_rows {max_rows:,}): "
+              f"peak {peak:.1f} MB, page p50 {statistics.median(seconds) * 1000:.2f} ms, "
+              f"max {max(seconds) * 1000:.2f} ms")
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,255 @@
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import pandas as pd
 from snowbook.executor import sql_executor
 
+# Presigned URLs are requested with this validity and reused from the cache
+# until an hour before they expire, so a cached URL is never handed out stale.
+URL_EXPIRY_SECONDS = 604800
+URL_CACHE_TTL_SECONDS = URL_EXPIRY_SECONDS - 3600
+PAGE_SIZE = int(os.getenv("SNOWBOOKS_PAGE_SIZE", "25"))
+# Hard cap on how many rows of one result can ever be pulled to the notebook.
+MAX_ROWS = int(os.getenv("SNOWBOOKS_MAX_ROWS", "10000"))
+# Thumbnails built by thumbnails.py and uploaded to the same stage under
+# THUMBNAIL_PREFIX are shown instead of the originals when the manifest exists.
+THUMBNAIL_MANIFEST = os.getenv("SNOWBOOKS_THUMBNAIL_MANIFEST", "thumbnails/manifest.json")
+THUMBNAIL_PREFIX = os.getenv("SNOWBOOKS_THUMBNAIL_PREFIX", "thumbnails/")
+THUMBNAIL_SIZE = os.getenv("SNOWBOOKS_THUMBNAIL_SIZE", "256")
+# Row number added to the materialized result so pages have a stable order.
+ROW_COLUMN = "SNOWBOOKS_ROW"
+# Pagers (each with its materialized result and fetch thread) kept per session.
+MAX_PAGERS = 8
+# Session state key naming the query whose page widgets caused the current rerun.
+WIDGET_RERUN = "snowbooks_widget_rerun"
+
+
+def load_thumbnails(path=THUMBNAIL_MANIFEST, size=THUMBNAIL_SIZE):
+    """Map image file name -> thumbnail file name for one size."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        manifest = json.load(fh)
+    return {name: entry["thumbnails"][size] for name, entry in manifest.items() if size in entry["thumbnails"]}
+
+
+THUMBNAILS = load_thumbnails()
+
+
+def thumbnail_key(stage, path):
+    thumbnail = THUMBNAILS.get(os.path.basename(path))
+    return (stage, THUMBNAIL_PREFIX + thumbnail) if thumbnail else (stage, path)
+
+
+class PresignedUrlCache:
+    """Signed URLs per (stage, relative path), shared by every query in the session."""
+
+    def __init__(self, ttl=URL_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.urls = {}
+        self.signed = 0
+        self.cache_hits = 0
+
+    def resolve(self, keys, sign):
+        """Return {key: url} for ``keys``, calling ``sign`` only for misses."""
+        if not keys:
+            return {}
+        now = time.time()
+        resolved = {}
+        missing = []
+        for key in set(keys):
+            url, expires_at = self.urls.get(key, (None, 0))
+            if expires_at > now:
+                resolved[key] = url
+            else:
+                missing.append(key)
+        self.cache_hits += len(keys) - len(missing)
+        if missing:
+            for key, url in sign(missing).items():
+                self.urls[key] = (url, now + self.ttl)
+                resolved[key] = url
+            self.signed += len(missing)
+        return resolved
+
+    def stats(self):
+        return {"signed": self.signed, "cache_hits": self.cache_hits, "cached_urls": len(self.urls)}
+
+
+def _quote(value):
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def sign_urls(session, keys):
+    """Sign many (stage, relative path) pairs with one query."""
+    values = ", ".join(f"({_quote(stage)}, {_quote(path)})" for stage, path in keys)
+    rows = session.sql(
+        f"SELECT column1, column2, FL_GET_PRESIGNED_URL(CONCAT(column1, '/', column2), {URL_EXPIRY_SECONDS}) "
+        f"FROM VALUES {values}"
+    ).collect()
+    return {(row[0], row[1]): row[2] for row in rows}
+
+
+def _result_key(result_df):
+    queries = getattr(result_df, "queries", None) or id(result_df)
+    return hashlib.sha1(str(queries).encode()).hexdigest()[:12]
+
+
+class ResultPager:
+    """Fetches a result one window of rows at a time.
+
+    The first ``max_rows`` rows are copied once into a temporary table
+    (``cache_result``) with a row number, and each page is read from it by
+    row-number range. Re-running the query per page could return the rows
+    in a different order, so pages could overlap or skip rows.
+
+    Only the requested page and the one after it are held in memory; the
+    next page is fetched on a background thread while the current one is
+    displayed.
+    """
+
+    def __init__(self, result_df, file_columns, page_size=PAGE_SIZE, max_rows=MAX_ROWS):
+        self.file_columns = file_columns
+        self.page_size = max(1, min(page_size, max_rows))
+        self.columns = [col for col, _ in result_df.dtypes]
+        select = []
+        for col in self.columns:
+            if col in file_columns:
+                select.append(f"FL_GET_STAGE({col}) as {col}__STAGE")
+                select.append(f"FL_GET_RELATIVE_PATH({col}) as {col}__PATH")
+            else:
+                select.append(col)
+        select.append(f"ROW_NUMBER() OVER (ORDER BY SEQ8()) - 1 as {ROW_COLUMN}")
+        self.total_rows = result_df.count()
+        self.paths_df = result_df.limit(max_rows).select_expr(", ".join(select)).cache_result()
+        self.reachable_rows = min(self.total_rows, max_rows)
+        self.page_count = max(1, math.ceil(self.reachable_rows / self.page_size))
+        self.rows_materialized = 0
+        self._pages = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _fetch(self, index):
+        first = index * self.page_size
+        last = min(first + self.page_size, self.reachable_rows) - 1
+        page_df = (
+            self.paths_df.filter(f"{ROW_COLUMN} BETWEEN {first} AND {last}")
+            .sort(ROW_COLUMN)
+            .to_pandas()
+            .drop(columns=ROW_COLUMN)
+            .reset_index(drop=True)
+        )
+        self.rows_materialized += len(page_df)
+        return page_df
+
+    def page(self, index):
+        index = min(max(index, 0), self.page_count - 1)
+        wanted = {index, index + 1} & set(range(self.page_count))
+        for stale in set(self._pages) - wanted:
+            self._pages.pop(stale).cancel()
+        for i in sorted(wanted):
+            if i not in self._pages:
+                self._pages[i] = self._executor.submit(self._fetch, i)
+        return self._pages[index].result().copy()
+
+    def close(self):
+        self._pages.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _widget_changed(key):
+    st.session_state[WIDGET_RERUN] = key
+
+
+def get_pager(result_df, file_columns, key):
+    """The pager for query ``key``, replaced whenever the statement has run again.
+
+    Changing the page or the image size re-runs the cell only to redraw it;
+    those runs (marked by the widgets' ``on_change``) keep the pager, its
+    materialized result and the prefetched page. Only the ``MAX_PAGERS`` most
+    recently used queries keep a pager.
+    """
+    pagers = st.session_state.setdefault("snowbooks_pagers", OrderedDict())
+    redraw = st.session_state.pop(WIDGET_RERUN, None) == key
+    pager = pagers.pop(key, None)
+    if pager is not None and not redraw:
+        pager.close()
+        pager = None
+    if pager is None:
+        pager = ResultPager(result_df, file_columns)
+    pagers[key] = pager
+    while len(pagers) > MAX_PAGERS:
+        pagers.popitem(last=False)[1].close()
+    return pager
+
+
+def render_image_page(result_df, file_columns, url_cache, sign):
+    """Show one page of ``result_df``, signing only the file URLs on that page."""
+    key = _result_key(result_df)
+    pager = get_pager(result_df, file_columns, key)
+    page_key = f"snowbooks_page_{key}"
+    # A new run of the statement can have fewer pages than the one before.
+    if st.session_state.get(page_key, 1) > pager.page_count:
+        st.session_state[page_key] = pager.page_count
+
+    col_page, col_info = st.columns([1, 3])
+    with col_page:
+        page = st.number_input(
+            "Page", min_value=1, max_value=pager.page_count, value=1, step=1, key=page_key,
+            on_change=_widget_changed, args=(key,),
+        ) - 1
+    with col_info:
+        st.caption(f"{pager.total_rows:,} rows, {pager.page_size} per page, {pager.page_count:,} pages")
+        if pager.total_rows > pager.reachable_rows:
+            st.caption(f"Only the first {pager.reachable_rows:,} rows can be browsed (SNOWBOOKS_MAX_ROWS).")
+        originals = not THUMBNAILS or st.toggle("Full-size images", key=f"snowbooks_originals_{key}",
+                                                on_change=_widget_changed, args=(key,))
+
+    page_df = pager.page(page)
+    for col in file_columns:
+        stages, paths = page_df.pop(f"{col}__STAGE"), page_df.pop(f"{col}__PATH")
+        keys = []
+        for stage, path in zip(stages, paths):
+            if pd.isna(stage) or pd.isna(path):
+                keys.append(None)
+            else:
+                keys.append((stage, path) if originals else thumbnail_key(stage, path))
+        urls = url_cache.resolve([k for k in keys if k], sign)
+        page_df.insert(pager.columns.index(col), col, [urls.get(k) for k in keys])
+
+    st.dataframe(page_df, column_config={col: st.column_config.ImageColumn() for col in file_columns})
+    stats = url_cache.stats()
+    # Rows pulled to the notebook include the prefetched page, whose URLs are not signed yet.
+    unfetched = pager.total_rows - pager.rows_materialized
+    st.caption(
+        f"Presigned URLs: {stats['signed']} signed, {stats['cache_hits']} served from cache; "
+        f"{max(unfetched, 0):,} result rows never fetched"
+    )
+
+
 if "patched" not in st.session_state:
     old_sql_statement = sql_executor.run_single_sql_statement
-    
+    url_cache = PresignedUrlCache()
+
     def patched_run_single_sql_statement(*args, **kwargs):
         result = old_sql_statement(*args, **kwargs)
-        
+
         result_df = result.query_scan_data_frame
-        select = []
-        image_columns = {}
-        import streamlit as st
-        
-        for col, type in result_df.dtypes:
-            if type == "file":
-                select.append(f"FL_GET_PRESIGNED_URL(CONCAT(FL_GET_STAGE({col}), '/', FL_GET_RELATIVE_PATH({col})), 604800) as {col}")
-                image_columns[col] = st.column_config.ImageColumn()
-            else:
-                select.append(col)
-        if image_columns:
-            
-            st.dataframe(result_df.select_expr(", ".join(select)), column_config=image_columns)
+        file_columns = [col for col, type in result_df.dtypes if type == "file"]
+        if file_columns:
+            render_image_page(
+                result_df,
+                file_columns,
+                url_cache,
+                lambda keys: sign_urls(result_df.session, keys),
+            )
         else:
             return result
-    
+
     sql_executor.run_single_sql_statement = patched_run_single_sql_statement
     st.session_state.patched = True
+    st.session_state.presigned_url_cache = url_cache
@@ -0,0 +1,135 @@
+"""Build content-hashed thumbnails for the food images.
+
+Each image is decoded once and resized to every configured size. Output
+names come from the image's SHA-256, so an edited image gets new names and an
+unchanged one is skipped (by size/mtime, or by hash if it was touched).
+``manifest.json`` maps each source file to its thumbnails; snowbooks_extras
+uses it to show thumbnails instead of full-size photos.
+
+    python thumbnails.py foodimg --out thumbnails --sizes 128 256 --format webp
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+MANIFEST_NAME = "manifest.json"
+
+
+def thumbnail_names(digest, sizes, fmt):
+    ext = "jpg" if fmt == "jpeg" else fmt
+    return {str(size): f"{digest[:16]}_{size}.{ext}" for size in sizes}
+
+
+def make_thumbnails(source, out_dir, sizes, fmt, quality):
+    """Worker: hash ``source`` and write any of its thumbnails that are missing."""
+    with open(source, "rb") as fh:
+        data = fh.read()
+    digest = hashlib.sha256(data).hexdigest()
+    names = thumbnail_names(digest, sizes, fmt)
+    todo = {size: name for size, name in names.items() if not os.path.exists(os.path.join(out_dir, name))}
+
+    written = 0
+    if todo:
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            # Largest first, so each smaller size is resampled from a smaller image.
+            for size in sorted(todo, key=int, reverse=True):
+                img.thumbnail((int(size), int(size)), Image.LANCZOS)
+                path = os.path.join(out_dir, todo[size])
+                img.save(f"{path}.tmp", format=fmt.upper(), quality=quality)
+                os.replace(f"{path}.tmp", path)
+    for name in names.values():
+        written += os.path.getsize(os.path.join(out_dir, name))
+    return {"sha256": digest, "bytes": len(data), "thumbnail_bytes": written, "thumbnails": names, "built": bool(todo)}
+
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def build(src_dir, out_dir, sizes, fmt="webp", quality=80, workers=None):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    sources = sorted(
+        name for name in os.listdir(src_dir) if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+
+    started = time.perf_counter()
+    pending = {}
+    skipped = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name in sources:
+            path = os.path.join(src_dir, name)
+            stat = os.stat(path)
+            entry = manifest.get(name)
+            if (
+                entry
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["bytes"] == stat.st_size
+                and entry["thumbnails"] == thumbnail_names(entry["sha256"], sizes, fmt)
+                and all(os.path.exists(os.path.join(out_dir, t)) for t in entry["thumbnails"].values())
+            ):
+                skipped += 1
+                continue
+            pending[name] = (stat, pool.submit(make_thumbnails, path, out_dir, sizes, fmt, quality))
+
+        built = 0
+        for name, (stat, future) in pending.items():
+            entry = future.result()
+            built += entry.pop("built")
+            manifest[name] = dict(entry, mtime_ns=stat.st_mtime_ns)
+
+    for name in set(manifest) - set(sources):
+        del manifest[name]
+    save_manifest(out_dir, manifest)
+
+    elapsed = time.perf_counter() - started
+    source_bytes = sum(entry["bytes"] for entry in manifest.values())
+    thumb_bytes = {
+        size: sum(os.path.getsize(os.path.join(out_dir, entry["thumbnails"][str(size)])) for entry in manifest.values())
+        for size in sizes
+    }
+    return {
+        "images": len(sources),
+        "built": built,
+        "skipped": skipped,
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(len(pending) / elapsed, 1) if pending else None,
+        "source_bytes": source_bytes,
+        "thumbnail_bytes": thumb_bytes,
+        "bytes_saved_per_view": {size: source_bytes - total for size, total in thumb_bytes.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("src_dir", nargs="?", default="foodimg")
+    parser.add_argument("--out", default="thumbnails")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256])
+    parser.add_argument("--format", choices=["webp", "jpeg"], default="webp")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    report = build(args.src_dir, args.out, args.sizes, args.format, args.quality, args.workers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+-- Trigger-based change log for public.ORDERS, read by postgres/app/cdc_exporter.py.
+-- Every insert, update and delete appends the full row image. TXID records the
+-- writing transaction so the exporter only ever reads transactions that have
+-- finished (see the exporter docstring). Requires Postgres 13+ for XID8.
+
+BEGIN;
+    CREATE TABLE IF NOT EXISTS public.ORDERS_CHANGELOG (
+        CHANGE_ID BIGSERIAL PRIMARY KEY,
+        TXID XID8 NOT NULL DEFAULT pg_current_xact_id(),
+        CHANGED_AT TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+        OP CHAR(1) NOT NULL,
+        ORDER_ID INTEGER NOT NULL,
+        ROW_DATA JSONB NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS ORDERS_CHANGELOG_TXID_IDX ON public.ORDERS_CHANGELOG (TXID);
+
+    CREATE OR REPLACE FUNCTION public.ORDERS_CHANGELOG_CAPTURE() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO public.ORDERS_CHANGELOG (OP, ORDER_ID, ROW_DATA)
+            VALUES ('D', OLD.ORDER_ID, to_jsonb(OLD));
+            RETURN OLD;
+        END IF;
+        INSERT INTO public.ORDERS_CHANGELOG (OP, ORDER_ID, ROW_DATA)
+        VALUES (LEFT(TG_OP, 1), NEW.ORDER_ID, to_jsonb(NEW));
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS ORDERS_CHANGELOG_TRG ON public.ORDERS;
+    CREATE TRIGGER ORDERS_CHANGELOG_TRG
+        AFTER INSERT OR UPDATE OR DELETE ON public.ORDERS
+        FOR EACH ROW EXECUTE FUNCTION public.ORDERS_CHANGELOG_CAPTURE();
+COMMIT;
+
+-- Optional: seed the log with the rows that already exist so the first export
+-- is a full snapshot and later ones are incremental.
+-- INSERT INTO public.ORDERS_CHANGELOG (OP, ORDER_ID, ROW_DATA)
+-- SELECT 'I', ORDER_ID, to_jsonb(o) FROM public.ORDERS o;
+
+SELECT * FROM public.ORDERS_CHANGELOG ORDER BY CHANGE_ID DESC LIMIT 10;
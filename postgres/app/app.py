@@ -2,97 +2,103 @@ import os
 from datetime import datetime
 
 import pandas as pd
-import psycopg2
-import psycopg2.extras
 import streamlit as st
-from dotenv import load_dotenv
 
-load_dotenv()
+import db
+import metrics
+from db import DB_CONFIG, get_connection
+from query_cache import NotifyListener, covers_all, covers_order, covers_page, get_cache
 
+# Set ORDERS_CACHE_CHANNEL to also drop cache entries when another replica
+# writes (Postgres LISTEN/NOTIFY).
+CACHE_CHANNEL = os.getenv("ORDERS_CACHE_CHANNEL")
 
-DB_CONFIG = {
-    "host": os.getenv("PGHOST"),
-    "port": int(os.getenv("PGPORT", "5432")),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD"),
-    "dbname": os.getenv("PGDATABASE", "postgres"),
-}
 
+def cache_gauges():
+    stats = get_cache().stats()
+    return {
+        "orders_admin_cache_hits": stats["hits"],
+        "orders_admin_cache_misses": stats["misses"],
+        "orders_admin_cache_entries": stats["entries"],
+    }
 
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+
+@st.cache_resource
+def start_metrics_server():
+    metrics.configure_logging()
+    return metrics.start_http_server(cache_gauges)
+
+
+@st.cache_resource
+def start_cache_listener():
+    if not CACHE_CHANNEL:
+        return None
+    listener = NotifyListener(get_connection, CACHE_CHANNEL, get_cache())
+    listener.start()
+    return listener
+
+
+def _orders_key(limit, order_id):
+    return ("order", order_id) if order_id else ("page", limit)
+
+
+def _orders_covers(rows, limit, order_id):
+    return covers_order(order_id) if order_id else covers_page(rows, limit)
 
 
 def fetch_orders(limit=10, order_id=None):
-    with get_connection() as conn:
-        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            if order_id:
-                cur.execute(
-                    """
-                    SELECT *
-                    FROM public.orders
-                    WHERE order_id = %s
-                    ORDER BY order_id
-                    """,
-                    (order_id,),
-                )
-            else:
-                cur.execute(
-                    """
-                    SELECT *
-                    FROM public.orders
-                    ORDER BY order_id
-                    LIMIT %s
-                    """,
-                    (limit,),
-                )
-            return cur.fetchall()
+    cache = get_cache()
+    key = _orders_key(limit, order_id)
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+
+    generation = cache.generation
+    rows = db.run(db.fetch_orders(limit, order_id))
+    cache.put(key, rows, _orders_covers(rows, limit, order_id), generation)
+    return rows
+
+
+def load_page(limit=10, order_id=None):
+    """Fetch the results, total count and status breakdown for one render.
+
+    Cached parts are served from memory; the rest run concurrently on the
+    pool. A part that fails or times out is returned as its exception.
+    """
+    queries = {
+        "results": (_orders_key(limit, order_id), lambda: db.fetch_orders(limit, order_id)),
+        "total": (("total",), db.count_orders),
+        "by_status": (("by_status",), db.status_breakdown),
+    }
+    cache = get_cache()
+    page = {}
+    pending = {}
+    for name, (key, query) in queries.items():
+        rows = cache.get(key)
+        if rows is None:
+            pending[name] = query()
+        else:
+            page[name] = rows
+
+    generation = cache.generation
+    for name, rows in db.gather(pending).items():
+        page[name] = rows
+        if isinstance(rows, Exception):
+            continue
+        key = queries[name][0]
+        covers = _orders_covers(rows, limit, order_id) if name == "results" else covers_all
+        cache.put(key, rows, covers, generation)
+    return page
 
 
 def upsert_order(data):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO public.orders (
-                    order_id,
-                    customer_id,
-                    mfg_plant_id,
-                    order_date,
-                    order_status,
-                    product_id,
-                    quantity,
-                    total_price,
-                    unit_price
-                ) VALUES (
-                    %(order_id)s,
-                    %(customer_id)s,
-                    %(mfg_plant_id)s,
-                    %(order_date)s,
-                    %(order_status)s,
-                    %(product_id)s,
-                    %(quantity)s,
-                    %(total_price)s,
-                    %(unit_price)s
-                )
-                ON CONFLICT (order_id) DO UPDATE SET
-                    customer_id = EXCLUDED.customer_id,
-                    mfg_plant_id = EXCLUDED.mfg_plant_id,
-                    order_date = EXCLUDED.order_date,
-                    order_status = EXCLUDED.order_status,
-                    product_id = EXCLUDED.product_id,
-                    quantity = EXCLUDED.quantity,
-                    total_price = EXCLUDED.total_price,
-                    unit_price = EXCLUDED.unit_price
-                """,
-                data,
-            )
+    db.run(db.upsert_order(data, CACHE_CHANNEL))
+    get_cache().invalidate_order(data["order_id"])
 
 
 def delete_order(order_id):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM public.orders WHERE order_id = %s", (order_id,))
+    db.run(db.delete_order(order_id, CACHE_CHANNEL))
+    get_cache().invalidate_order(order_id)
 
 
 def parse_datetime(value):
@@ -105,6 +111,8 @@ def main():
     st.set_page_config(page_title="Orders Admin", page_icon="📦", layout="wide")
     st.title("Orders Admin")
     st.caption("Add, edit, delete, and search orders by ORDER_ID")
+    start_metrics_server()
+    start_cache_listener()
 
     with st.sidebar:
         st.header("Connection")
@@ -113,6 +121,13 @@ def main():
         st.text_input("User", value=DB_CONFIG.get("user") or "", disabled=True)
         st.text_input("Database", value=DB_CONFIG.get("dbname") or "", disabled=True)
 
+        st.header("Cache")
+        stats = get_cache().stats()
+        st.caption(
+            f"{stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%}), {stats['entries']} entries"
+        )
+
     st.subheader("Search by ORDER_ID")
     search_id = st.text_input("Order ID", placeholder="e.g. 10")
 
@@ -122,24 +137,44 @@ def main():
     with col_b:
         search_btn = st.button("Search")
 
-    results = []
+    search_order_id = None
+    invalid_search = False
     if search_btn and search_id:
         try:
-            results = fetch_orders(order_id=int(search_id))
+            search_order_id = int(search_id)
         except ValueError:
             st.error("Order ID must be an integer.")
-    elif search_btn:
-        results = fetch_orders(limit=int(show_limit))
-    else:
-        results = fetch_orders(limit=int(show_limit))
+            invalid_search = True
+    page = load_page(limit=int(show_limit), order_id=search_order_id)
 
+    # A search that could not run shows no records, not the default page.
+    results = [] if invalid_search else page["results"]
     st.subheader("Results")
-    if results:
-        df = pd.DataFrame([dict(row) for row in results])
-        st.dataframe(df, use_container_width=True)
+    if isinstance(results, Exception):
+        st.error(f"Failed to load orders: {results}")
+    elif results:
+        with metrics.timed("dataframe", "results") as stage:
+            df = pd.DataFrame([dict(row) for row in results])
+            stage.rows = len(df)
+            stage.bytes = int(df.memory_usage(deep=True).sum())
+        with metrics.timed("render", "results"):
+            st.dataframe(df, use_container_width=True)
     else:
         st.info("No records found.")
 
+    st.subheader("Summary")
+    col_total, col_status = st.columns([1, 3])
+    with col_total:
+        if isinstance(page["total"], Exception):
+            st.error(f"Failed to count orders: {page['total']}")
+        else:
+            st.metric("Total orders", f"{page['total'][0]['total']:,}")
+    with col_status:
+        if isinstance(page["by_status"], Exception):
+            st.error(f"Failed to load status breakdown: {page['by_status']}")
+        elif page["by_status"]:
+            st.dataframe(pd.DataFrame(page["by_status"]), use_container_width=True, hide_index=True)
+
     st.divider()
     st.subheader("Add or Edit Order")
 
@@ -184,6 +219,8 @@ def main():
         except Exception as exc:  # noqa: BLE001
             st.error(f"Failed to delete order: {exc}")
 
+    metrics.export(cache_gauges())
+
 
 if __name__ == "__main__":
     main()
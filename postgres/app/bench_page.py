@@ -0,0 +1,78 @@
+"""Page-render latency of the orders admin data layer, before and after.
+
+"before" runs the three queries a page needs one after another, each on a
+fresh synchronous connection, the way the app used to. "after" runs them
+concurrently on the async pool. The query cache is bypassed in both.
+
+    python bench_page.py --iterations 50 --limit 100
+"""
+import argparse
+import json
+import statistics
+import time
+
+import db
+
+PAGE_QUERIES = {
+    "results": "SELECT * FROM public.orders ORDER BY order_id LIMIT %s",
+    "total": "SELECT count(*) AS total FROM public.orders",
+    "by_status": (
+        "SELECT order_status, count(*) AS orders, sum(total_price) AS total_price "
+        "FROM public.orders GROUP BY order_status ORDER BY orders DESC"
+    ),
+}
+
+
+def render_serial(limit):
+    for name, sql in PAGE_QUERIES.items():
+        with db.get_connection() as conn:
+            conn.execute(sql, (limit,) if name == "results" else None).fetchall()
+
+
+def render_concurrent(limit):
+    results = db.gather(
+        {
+            "results": db.fetch_orders(limit),
+            "total": db.count_orders(),
+            "by_status": db.status_breakdown(),
+        }
+    )
+    for rows in results.values():
+        if isinstance(rows, Exception):
+            raise rows
+
+
+def measure(render, limit, iterations):
+    render(limit)  # warm up connections and plans
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render(limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    report = {
+        "iterations": args.iterations,
+        "limit": args.limit,
+        "before": measure(render_serial, args.limit, args.iterations),
+        "after": measure(render_concurrent, args.limit, args.iterations),
+    }
+    report["speedup_p50"] = round(report["before"]["p50_ms"] / report["after"]["p50_ms"], 2)
+    db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Incremental change export of public.orders to a local stage directory.
+
+Reads the trigger-maintained ``public.orders_changelog`` (see
+``postgres/03_orders_changelog.sql``) and writes the changes as compressed,
+size-bounded CSV or Parquet files ready to ``PUT`` to a Snowflake stage.
+
+Exactly-once: each run exports the transactions with ``txid`` in
+``[watermark, upper)``, where ``upper`` is the xmin of a snapshot taken at the
+start of the run. Every transaction below a snapshot's xmin has finished, so
+no change can later appear inside an exported range, and consecutive ranges
+never overlap. ``upper`` is checkpointed as ``pending`` before any file is
+written. After a crash the next run redoes exactly that range, overwriting the
+same deterministic file names, and only then advances the watermark.
+
+    python cdc_exporter.py --stage-dir ./stage
+    python cdc_exporter.py --stage-dir ./stage --format parquet --interval 30
+"""
+import argparse
+import csv
+import glob
+import gzip
+import io
+import json
+import os
+import time
+
+import psycopg
+
+from db import DB_CONFIG
+
+CHECKPOINT_NAME = "_checkpoint.json"
+NUMERIC_OID = 1700
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+# Arrow type name per Postgres type OID of the exported columns; anything else is written as a string.
+ARROW_TYPES = {
+    16: "bool_",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1082: "date32",
+}
+
+CHANGES_SQL = """
+    SELECT c.change_id, c.txid::text::bigint AS txid, c.changed_at, c.op, r.*
+    FROM public.orders_changelog c,
+         jsonb_populate_record(NULL::public.orders, c.row_data) r
+    WHERE c.txid >= %s::text::xid8 AND c.txid < %s::text::xid8
+    ORDER BY c.change_id
+"""
+
+
+def load_checkpoint(stage_dir):
+    path = os.path.join(stage_dir, CHECKPOINT_NAME)
+    if not os.path.exists(path):
+        return {"watermark": 0, "pending": None, "files": []}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_checkpoint(stage_dir, checkpoint):
+    path = os.path.join(stage_dir, CHECKPOINT_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(checkpoint, fh, indent=2)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def arrow_schema(description):
+    """The Parquet schema for the export query's columns, fixed by their Postgres types.
+
+    Every part gets the same schema, so a column that is all NULL in one part
+    has the same type as in the next.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for column in description:
+        if column.type_code == NUMERIC_OID and column.precision:
+            arrow_type = pa.decimal128(column.precision, column.scale or 0)
+        elif column.type_code == TIMESTAMP_OID:
+            arrow_type = pa.timestamp("us")
+        elif column.type_code == TIMESTAMPTZ_OID:
+            arrow_type = pa.timestamp("us", tz="UTC")
+        else:
+            arrow_type = getattr(pa, ARROW_TYPES.get(column.type_code, "string"))()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+class CsvPart:
+    extension = "csv.gz"
+
+    def __init__(self, path, description):
+        columns = [col.name for col in description]
+        self.path = path
+        self._raw = open(path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._text = io.TextIOWrapper(self._gzip, encoding="utf-8", newline="")
+        self._writer = csv.writer(self._text)
+        self._writer.writerow(columns)
+        self.rows = 0
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def close(self):
+        self._text.close()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+
+class ParquetPart:
+    extension = "parquet"
+
+    def __init__(self, path, description):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise SystemExit("--format parquet needs pyarrow: pip install pyarrow") from exc
+        self.path = path
+        self.schema = arrow_schema(description)
+        self._values = [[] for _ in description]
+        self.rows = 0
+
+    def write(self, row):
+        for values, value in zip(self._values, row):
+            values.append(value)
+        self.rows += 1
+
+    def close(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in
+                                      zip(self._values, self.schema)], schema=self.schema)
+        pq.write_table(table, self.path, compression="zstd")
+
+
+WRITERS = {"csv": CsvPart, "parquet": ParquetPart}
+
+
+def row_size(row):
+    return sum(len(str(value)) + 1 for value in row)
+
+
+def export_range(conn, stage_dir, lower, upper, file_format, max_file_bytes, fetch_size):
+    """Write every change with ``lower <= txid < upper``; return the file names."""
+    writer_cls = WRITERS[file_format]
+    prefix = f"orders_{lower:020d}_{upper:020d}"
+    # A crashed run may have left parts for this range; they are rewritten.
+    for stale in glob.glob(os.path.join(stage_dir, f"{prefix}_*")):
+        os.remove(stale)
+
+    files = []
+    part = None
+    part_bytes = 0
+    with conn.cursor(name="orders_cdc") as cur:
+        cur.itersize = fetch_size
+        cur.execute(CHANGES_SQL, (lower, upper))
+        for row in cur:
+            if part is None:
+                name = f"{prefix}_{len(files):05d}.{writer_cls.extension}"
+                part = writer_cls(os.path.join(stage_dir, f"{name}.tmp"), cur.description)
+                part_bytes = 0
+            part.write(row)
+            part_bytes += row_size(row)
+            if part_bytes >= max_file_bytes:
+                files.append(_finish(part))
+                part = None
+    if part is not None:
+        files.append(_finish(part))
+    conn.rollback()
+    return files
+
+
+def _finish(part):
+    part.close()
+    final_path = part.path[: -len(".tmp")]
+    os.replace(part.path, final_path)
+    return os.path.basename(final_path)
+
+
+def run_once(args):
+    os.makedirs(args.stage_dir, exist_ok=True)
+    checkpoint = load_checkpoint(args.stage_dir)
+    started = time.perf_counter()
+    with psycopg.connect(**DB_CONFIG) as conn:
+        upper = checkpoint["pending"]
+        if upper is None:
+            upper = conn.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint").fetchone()[0]
+            conn.rollback()
+        lower = checkpoint["watermark"]
+        if upper <= lower:
+            return {"files": [], "watermark": lower}
+
+        save_checkpoint(args.stage_dir, dict(checkpoint, pending=upper))
+        files = export_range(
+            conn, args.stage_dir, lower, upper, args.format, args.max_file_bytes, args.fetch_size
+        )
+        save_checkpoint(args.stage_dir, {"watermark": upper, "pending": None, "files": files})
+
+        if args.purge:
+            conn.execute("DELETE FROM public.orders_changelog WHERE txid < %s::text::xid8", (upper,))
+            conn.commit()
+
+    return {
+        "files": files,
+        "watermark": upper,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stage-dir", default="stage")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument(
+        "--max-file-bytes",
+        type=int,
+        default=100 * 1024 * 1024,
+        help="approximate uncompressed bytes per output file",
+    )
+    parser.add_argument("--fetch-size", type=int, default=10000)
+    parser.add_argument("--interval", type=float, help="keep running, exporting every N seconds")
+    parser.add_argument(
+        "--purge", action="store_true", help="delete exported rows from the changelog after checkpointing"
+    )
+    args = parser.parse_args()
+
+    while True:
+        print(json.dumps(run_once(args)))
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Checks cdc_exporter against a local Postgres with the change log trigger.
+
+Installs ``postgres/03_orders_changelog.sql`` if needed, then runs Parquet
+exports while writer threads change orders in their own transactions (some
+rolled back, some kept open across an export). One export is killed with
+SIGKILL after its files are written but before the checkpoint records them,
+and the next run resumes. The check then asserts that:
+
+- every change log row of the test's orders is in exactly one exported file;
+- every part has the same Parquet schema, including a part whose nullable
+  columns are all NULL;
+- ``--purge`` deletes only rows below the watermark, and a change from a
+  transaction still open during the purge is exported by the next run.
+
+Only ORDER_IDs from ``--id-base`` up are written, and they and their change
+log rows are deleted at the end. The purge deletes every change log row below
+the watermark, not just the test's, so run this against a test database.
+Exits non-zero on the first failed check.
+
+    python check_cdc_exporter.py
+    python check_cdc_exporter.py --writers 8 --duration 10
+"""
+import argparse
+import collections
+import glob
+import multiprocessing
+import os
+import random
+import signal
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+import psycopg
+import pyarrow.parquet as pq
+
+import cdc_exporter
+from db import DB_CONFIG
+
+ID_RANGE = 500
+CHANGELOG_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "03_orders_changelog.sql")
+UPSERT_SQL = """
+    INSERT INTO public.orders (order_id, customer_id, mfg_plant_id, order_date, order_status,
+                               product_id, quantity, total_price, unit_price)
+    VALUES (%s, %s, %s, now(), %s, %s, %s, %s, %s)
+    ON CONFLICT (order_id) DO UPDATE SET order_status = EXCLUDED.order_status, quantity = EXCLUDED.quantity,
+        total_price = EXCLUDED.total_price
+"""
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+    print(f"ok   {message}")
+
+
+def export_args(stage_dir, purge=False):
+    # Small parts, so every run writes several files.
+    return argparse.Namespace(stage_dir=stage_dir, format="parquet", max_file_bytes=4000, fetch_size=100,
+                              purge=purge)
+
+
+def current_xmin(conn):
+    xmin = conn.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint").fetchone()[0]
+    conn.rollback()
+    return xmin
+
+
+def upsert(conn, order_id, rng):
+    quantity = rng.randint(1, 5)
+    unit_price = Decimal(rng.randint(1000, 99999)) / 100
+    conn.execute(UPSERT_SQL, (order_id, f"C{rng.randint(1, 50)}", f"P{rng.randint(1, 5)}", rng.choice(["Placed", "Shipped"]),
+                              f"SKU{rng.randint(1, 20)}", quantity, quantity * unit_price, unit_price))
+
+
+def writer(id_base, seed, stop, counts):
+    """Write orders in 1-5 statement transactions until ``stop``; a few are rolled back."""
+    rng = random.Random(seed)
+    with psycopg.connect(**DB_CONFIG) as conn:
+        while not stop.is_set():
+            for _ in range(rng.randint(1, 5)):
+                order_id = id_base + rng.randrange(ID_RANGE)
+                if rng.random() < 0.2:
+                    conn.execute("DELETE FROM public.orders WHERE order_id = %s", (order_id,))
+                else:
+                    upsert(conn, order_id, rng)
+            time.sleep(rng.random() * 0.02)
+            if rng.random() < 0.1:
+                conn.rollback()
+                counts["rolled_back"] += 1
+            else:
+                conn.commit()
+                counts["committed"] += 1
+
+
+def long_writer(id_base, stop):
+    """Keep a transaction open across several exports, then commit it."""
+    with psycopg.connect(**DB_CONFIG) as conn:
+        while not stop.is_set():
+            upsert(conn, id_base + ID_RANGE, random.Random())
+            stop.wait(0.5)
+            conn.commit()
+
+
+def _crash_before_commit(stage_dir):
+    """Run one export that SIGKILLs itself once its files are written, before the checkpoint names them."""
+    save_checkpoint = cdc_exporter.save_checkpoint
+
+    def crash(stage, checkpoint):
+        if checkpoint["pending"] is None and checkpoint["files"]:
+            os.kill(os.getpid(), signal.SIGKILL)
+        save_checkpoint(stage, checkpoint)
+
+    cdc_exporter.save_checkpoint = crash
+    cdc_exporter.run_once(export_args(stage_dir))
+
+
+def crash_export(stage_dir):
+    """True if an export was killed after writing files (False when it had nothing to write)."""
+    process = multiprocessing.get_context("fork").Process(target=_crash_before_commit, args=(stage_dir,))
+    process.start()
+    process.join()
+    return process.exitcode == -signal.SIGKILL
+
+
+def exported_ids(stage_dir, id_base):
+    """change_id -> number of files it appears in, for the test's orders; and every part's schema."""
+    counts = collections.Counter()
+    schemas = []
+    for path in sorted(glob.glob(os.path.join(stage_dir, "orders_*.parquet"))):
+        table = pq.read_table(path)
+        schemas.append(table.schema)
+        order_id = table.column("order_id").to_pylist()
+        for change_id, oid in zip(table.column("change_id").to_pylist(), order_id):
+            if oid >= id_base:
+                counts[change_id] += 1
+    return counts, schemas
+
+
+def changelog_ids(conn, id_base):
+    rows = conn.execute("SELECT change_id FROM public.orders_changelog WHERE order_id >= %s", (id_base,)).fetchall()
+    conn.rollback()
+    return {row[0] for row in rows}
+
+
+def cleanup(conn, id_base):
+    conn.execute("DELETE FROM public.orders WHERE order_id >= %s", (id_base,))
+    conn.execute("DELETE FROM public.orders_changelog WHERE order_id >= %s", (id_base,))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5, help="seconds of concurrent writes")
+    parser.add_argument("--id-base", type=int, default=2_100_000_000)
+    args = parser.parse_args()
+    id_base = args.id_base
+
+    with psycopg.connect(**DB_CONFIG, autocommit=True) as conn, open(CHANGELOG_SQL) as fh:
+        conn.execute(fh.read())
+    stage_dir = tempfile.mkdtemp(prefix="cdc_check_")
+    conn = psycopg.connect(**DB_CONFIG)
+    try:
+        cleanup(conn, id_base)
+        # Start after everything already in the log.
+        cdc_exporter.save_checkpoint(stage_dir, {"watermark": current_xmin(conn), "pending": None, "files": []})
+
+        # A part where every nullable column is NULL.
+        for order_id in range(id_base + ID_RANGE + 1, id_base + ID_RANGE + 41):
+            conn.execute("INSERT INTO public.orders (order_id) VALUES (%s)", (order_id,))
+        conn.commit()
+        cdc_exporter.run_once(export_args(stage_dir))
+
+        stop = threading.Event()
+        counts = collections.Counter()
+        threads = [threading.Thread(target=writer, args=(id_base, i, stop, counts)) for i in range(args.writers)]
+        threads.append(threading.Thread(target=long_writer, args=(id_base, stop)))
+        for thread in threads:
+            thread.start()
+        runs = crashes = 0
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline or not crashes:
+            time.sleep(0.2)
+            if not crashes and runs >= 3:
+                crashes += crash_export(stage_dir)
+                if crashes:
+                    checkpoint = cdc_exporter.load_checkpoint(stage_dir)
+                    prefix = f"orders_{checkpoint['watermark']:020d}_{checkpoint['pending'] or 0:020d}_"
+                    check(checkpoint["pending"] is not None and glob.glob(os.path.join(stage_dir, f"{prefix}*.parquet")),
+                          "killed export: its files written, its range still pending in the checkpoint")
+                continue
+            cdc_exporter.run_once(export_args(stage_dir))
+            runs += 1
+        stop.set()
+        for thread in threads:
+            thread.join()
+        cdc_exporter.run_once(export_args(stage_dir))
+        print(f"     {counts['committed']:,} transactions committed, {counts['rolled_back']:,} rolled back, "
+              f"{runs + 2} exports, 1 killed")
+
+        checkpoint = cdc_exporter.load_checkpoint(stage_dir)
+        check(checkpoint["pending"] is None, "resumed: no range left pending")
+        exported, schemas = exported_ids(stage_dir, id_base)
+        expected = changelog_ids(conn, id_base)
+        check(set(exported) == expected, f"all {len(expected):,} change log rows of the test's orders exported")
+        check(max(exported.values()) == 1, "no change exported twice, across the killed and resumed run")
+        check(len(schemas) > 1 and all(schema.equals(schemas[0]) for schema in schemas),
+              f"all {len(schemas)} parts share one Parquet schema, all-NULL columns included")
+
+        # One change for the purging run to export, and one made before it but
+        # committed after it, which is above its watermark.
+        upsert(conn, id_base + 1, random.Random(1))
+        conn.commit()
+        held = psycopg.connect(**DB_CONFIG)
+        upsert(held, id_base, random.Random(0))
+        result = cdc_exporter.run_once(export_args(stage_dir, purge=True))
+        held.commit()
+        held.close()
+        below, ours = conn.execute(
+            "SELECT count(*) FILTER (WHERE txid < %s::text::xid8), count(*) FILTER (WHERE order_id >= %s) "
+            "FROM public.orders_changelog", (result["watermark"], id_base)
+        ).fetchone()
+        conn.rollback()
+        check(below == 0, "purge: no change log rows left below the watermark")
+        check(ours == 1, "purge: the change committed after the export's snapshot was kept")
+        kept = changelog_ids(conn, id_base)
+        cdc_exporter.run_once(export_args(stage_dir))
+        exported, _ = exported_ids(stage_dir, id_base)
+        check(kept <= set(exported) and max(exported.values()) == 1, "purge: the kept change is exported by the next run, once")
+    finally:
+        conn.rollback()
+        cleanup(conn, id_base)
+        conn.close()
+        for path in glob.glob(os.path.join(stage_dir, "*")):
+            os.remove(path)
+        os.rmdir(stage_dir)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import threading
+import time
+
+import psycopg
+from dotenv import load_dotenv
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+import metrics
+
+load_dotenv()
+
+
+DB_CONFIG = {
+    "host": os.getenv("PGHOST"),
+    "port": int(os.getenv("PGPORT", "5432")),
+    "user": os.getenv("PGUSER"),
+    "password": os.getenv("PGPASSWORD"),
+    "dbname": os.getenv("PGDATABASE", "postgres"),
+}
+
+POOL_MIN_SIZE = int(os.getenv("ORDERS_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("ORDERS_POOL_MAX_SIZE", "8"))
+QUERY_TIMEOUT = float(os.getenv("ORDERS_QUERY_TIMEOUT", "10"))
+BYTES_SAMPLE_ROWS = 32
+
+# Streamlit reruns the script on a fresh thread for every interaction, so the
+# pool lives on one long-running event loop owned by a daemon thread and the
+# sync code submits coroutines to it.
+_loop = None
+_pool = None
+_lock = threading.Lock()
+
+
+def get_connection():
+    return psycopg.connect(**DB_CONFIG)
+
+
+def _get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="orders-db", daemon=True).start()
+        return _loop
+
+
+async def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            kwargs={**DB_CONFIG, "row_factory": dict_row, "autocommit": True},
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            open=False,
+        )
+    # Safe to call repeatedly; concurrent first queries share one open.
+    await _pool.open()
+    return _pool
+
+
+def run(coro, timeout=QUERY_TIMEOUT):
+    """Run ``coro`` on the database loop and wait for its result.
+
+    On timeout the coroutine is cancelled, which also cancels the statement
+    on the server, and ``TimeoutError`` is raised.
+    """
+    future = asyncio.run_coroutine_threadsafe(asyncio.wait_for(coro, timeout), _get_loop())
+    return future.result()
+
+
+def gather(queries, timeout=QUERY_TIMEOUT):
+    """Run a ``{name: coroutine}`` mapping concurrently.
+
+    Each query gets its own ``timeout``. The result maps every name to its
+    rows, or to the exception it raised, so one slow or failing query does
+    not take down the rest of the page.
+    """
+
+    async def _gather():
+        names = list(queries)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(queries[name], timeout) for name in names),
+            return_exceptions=True,
+        )
+        return dict(zip(names, results))
+
+    return asyncio.run_coroutine_threadsafe(_gather(), _get_loop()).result()
+
+
+def close():
+    """Close the pool and stop the database loop (for scripts, not the app)."""
+    global _loop, _pool
+    with _lock:
+        if _loop is None:
+            return
+        if _pool is not None:
+            asyncio.run_coroutine_threadsafe(_pool.close(), _loop).result()
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop, _pool = None, None
+
+
+def _result_bytes(cur):
+    """Wire size of the result, estimated from its first ``BYTES_SAMPLE_ROWS`` rows.
+
+    Measuring every cell would cost a Python call per value on every fetch.
+    """
+    result = cur.pgresult
+    if result is None or not result.ntuples:
+        return 0
+    sampled = min(result.ntuples, BYTES_SAMPLE_ROWS)
+    size = sum(len(result.get_value(row, col) or b"") for row in range(sampled) for col in range(result.nfields))
+    return size * result.ntuples // sampled
+
+
+async def _explain(conn, sql, params):
+    cur = await conn.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+    return "\n".join(row["QUERY PLAN"] for row in await cur.fetchall())
+
+
+async def _fetch(name, sql, params=None):
+    """Run a read query, recording connect/execute/fetch stage timings.
+
+    Reads slower than ORDERS_SLOW_QUERY_MS are re-run under
+    ``EXPLAIN (ANALYZE, BUFFERS)`` and logged with their plan.
+    """
+    pool = await _get_pool()
+    with metrics.timed("connect", name):
+        conn = await pool.getconn()
+    try:
+        start = time.perf_counter()
+        with metrics.timed("execute", name):
+            cur = await conn.execute(sql, params)
+        with metrics.timed("fetch", name) as stage:
+            rows = await cur.fetchall()
+            stage.rows = len(rows)
+            stage.bytes = _result_bytes(cur)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms >= metrics.SLOW_QUERY_MS:
+            metrics.report_slow_query(name, elapsed_ms, sql, await _explain(conn, sql, params))
+        return rows
+    finally:
+        await pool.putconn(conn)
+
+
+async def _execute(name, sql, params, notify_channel=None, notify_payload=None):
+    """Run a write in one transaction, optionally announcing it with pg_notify."""
+    pool = await _get_pool()
+    with metrics.timed("connect", name):
+        conn = await pool.getconn()
+    try:
+        async with conn.transaction():
+            with metrics.timed("execute", name) as stage:
+                cur = await conn.execute(sql, params)
+                stage.rows = cur.rowcount
+            if notify_channel:
+                await conn.execute("SELECT pg_notify(%s, %s)", (notify_channel, str(notify_payload)))
+    finally:
+        await pool.putconn(conn)
+
+
+async def fetch_orders(limit=10, order_id=None):
+    if order_id:
+        return await _fetch(
+            "fetch_order",
+            """
+            SELECT *
+            FROM public.orders
+            WHERE order_id = %s
+            ORDER BY order_id
+            """,
+            (order_id,),
+        )
+    return await _fetch(
+        "fetch_orders",
+        """
+        SELECT *
+        FROM public.orders
+        ORDER BY order_id
+        LIMIT %s
+        """,
+        (limit,),
+    )
+
+
+async def count_orders():
+    return await _fetch("count_orders", "SELECT count(*) AS total FROM public.orders")
+
+
+async def status_breakdown():
+    return await _fetch(
+        "status_breakdown",
+        """
+        SELECT order_status, count(*) AS orders, sum(total_price) AS total_price
+        FROM public.orders
+        GROUP BY order_status
+        ORDER BY orders DESC
+        """,
+    )
+
+
+async def upsert_order(data, notify_channel=None):
+    await _execute(
+        "upsert_order",
+        """
+        INSERT INTO public.orders (
+            order_id,
+            customer_id,
+            mfg_plant_id,
+            order_date,
+            order_status,
+            product_id,
+            quantity,
+            total_price,
+            unit_price
+        ) VALUES (
+            %(order_id)s,
+            %(customer_id)s,
+            %(mfg_plant_id)s,
+            %(order_date)s,
+            %(order_status)s,
+            %(product_id)s,
+            %(quantity)s,
+            %(total_price)s,
+            %(unit_price)s
+        )
+        ON CONFLICT (order_id) DO UPDATE SET
+            customer_id = EXCLUDED.customer_id,
+            mfg_plant_id = EXCLUDED.mfg_plant_id,
+            order_date = EXCLUDED.order_date,
+            order_status = EXCLUDED.order_status,
+            product_id = EXCLUDED.product_id,
+            quantity = EXCLUDED.quantity,
+            total_price = EXCLUDED.total_price,
+            unit_price = EXCLUDED.unit_price
+        """,
+        data,
+        notify_channel,
+        data["order_id"],
+    )
+
+
+async def delete_order(order_id, notify_channel=None):
+    await _execute(
+        "delete_order",
+        "DELETE FROM public.orders WHERE order_id = %s",
+        (order_id,),
+        notify_channel,
+        order_id,
+    )
@@ -0,0 +1,347 @@
+"""Concurrent-session load test for the orders admin.
+
+Each simulated session is a thread that repeatedly picks an action from the
+``--mix``, runs it, and waits an exponentially distributed think time:
+
+- ``browse``: a page render, i.e. ``app.load_page`` (``fetch_orders`` plus
+  the total and the status breakdown);
+- ``search``: a page render searching a random existing ORDER_ID;
+- ``upsert``: ``app.upsert_order`` on an id in the test range;
+- ``delete``: ``app.delete_order`` on an id in the test range.
+
+``--driver direct`` calls those functions, so the query cache, the async
+pool and its limits behave as in one app server process. ``--driver
+apptest`` gives every session its own headless ``AppTest`` of ``app.py`` and
+clicks through the page instead, so script reruns are included (the
+websocket layer is not). AppTest installs a process-wide stand-in for the
+Streamlit runtime for the length of each run, so its sessions take turns
+running the script and only overlap while thinking. Both drivers read and fill the one process-wide
+cache from ``query_cache.get_cache()``, as the sessions of a real server do;
+``--no-cache`` makes its entries expire immediately for both. Each session
+draws its actions, ids and orders from its own generator seeded from
+``--seed``.
+
+Writes only touch ORDER_IDs from ``--write-id-base`` up and are deleted at
+the end. Each ``--sessions`` level runs for ``--duration`` seconds. A
+sampler records ``pg_stat_activity`` connection counts and the pool's
+waiting requests. The report (throughput, latency percentiles and errors
+per action, connection counts per level) is printed as JSON, and appended
+to ``--output`` as one line per run for tracking trends.
+
+    python load_test.py --sessions 1 5 10 20 --duration 30
+    python load_test.py --driver apptest --sessions 4 --mix browse=6,search=3,upsert=1
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+import psycopg
+
+import app
+import db
+from db import DB_CONFIG
+from query_cache import get_cache
+
+ACTIONS = ["browse", "search", "upsert", "delete"]
+DEFAULT_MIX = "browse=60,search=30,upsert=7,delete=3"
+WRITE_ID_RANGE = 10_000
+PERCENTILES = (50, 90, 95, 99)
+ACTIVITY_SQL = """
+    SELECT count(*) AS total,
+           count(*) FILTER (WHERE state = 'active') AS active,
+           count(*) FILTER (WHERE state = 'idle') AS idle,
+           count(*) FILTER (WHERE state LIKE 'idle in transaction%') AS idle_in_transaction
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+"""
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def random_order(order_id, rng):
+    unit_price = rng.randint(5_000, 500_000)
+    quantity = rng.randint(1, 5)
+    return {
+        "order_id": order_id,
+        "customer_id": str(rng.randint(100_000, 120_000)),
+        "mfg_plant_id": str(rng.randint(1001, 1024)),
+        "order_date": datetime.now().replace(microsecond=0),
+        "order_status": rng.choice(["Placed", "In Production", "Shipped", "Delivered"]),
+        "product_id": str(rng.randint(10_001, 15_000)),
+        "quantity": quantity,
+        "total_price": float(quantity * unit_price),
+        "unit_price": float(unit_price),
+    }
+
+
+def raise_errors(page):
+    for rows in page.values():
+        if isinstance(rows, Exception):
+            raise rows
+
+
+class DirectSession:
+    """Runs actions through the app's data functions."""
+
+    def __init__(self, config, rng):
+        self.config = config
+        self.rng = rng
+
+    def browse(self):
+        raise_errors(app.load_page(limit=self.config["limit"]))
+
+    def search(self):
+        raise_errors(app.load_page(limit=self.config["limit"], order_id=self.rng.randint(1, self.config["max_id"])))
+
+    def upsert(self):
+        app.upsert_order(random_order(self.config["write_id_base"] + self.rng.randrange(WRITE_ID_RANGE), self.rng))
+
+    def delete(self):
+        app.delete_order(self.config["write_id_base"] + self.rng.randrange(WRITE_ID_RANGE))
+
+
+class AppTestSession:
+    """Runs actions by driving a headless copy of the page."""
+
+    # AppTest sets and clears a global Runtime instance around every run, so
+    # concurrent runs would tear it down under each other.
+    run_lock = threading.Lock()
+
+    def __init__(self, config, rng):
+        from streamlit.testing.v1 import AppTest
+
+        self.config = config
+        self.rng = rng
+        self.at = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+        self.at.default_timeout = config["timeout"]
+        self._run()
+
+    def _run(self):
+        with self.run_lock:
+            self.at.run()
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+        for element in self.at.error:
+            raise RuntimeError(element.value)
+
+    def _widget(self, kind, label):
+        return next(element for element in getattr(self.at, kind) if element.label == label)
+
+    def browse(self):
+        self._widget("number_input", "Rows").set_value(self.config["limit"])
+        self._run()
+
+    def search(self):
+        self._widget("text_input", "Order ID").set_value(str(self.rng.randint(1, self.config["max_id"])))
+        self._widget("button", "Search").click()
+        self._run()
+
+    def upsert(self):
+        order = random_order(self.config["write_id_base"] + self.rng.randrange(WRITE_ID_RANGE), self.rng)
+        for label in ("CUSTOMER_ID", "MFG_PLANT_ID", "ORDER_STATUS", "PRODUCT_ID"):
+            self._widget("text_input", label).set_value(order[label.lower()])
+        for label in ("ORDER_ID", "QUANTITY", "TOTAL_PRICE", "UNIT_PRICE"):
+            self._widget("number_input", label).set_value(order[label.lower()])
+        self._widget("button", "Add / Update").click()
+        self._run()
+
+    def delete(self):
+        self.at.number_input(key="delete_id").set_value(
+            self.config["write_id_base"] + self.rng.randrange(WRITE_ID_RANGE)
+        )
+        self._widget("button", "Delete").click()
+        self._run()
+
+
+DRIVERS = {"direct": DirectSession, "apptest": AppTestSession}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in ACTIONS}
+        self.errors = {name: 0 for name in ACTIONS}
+        self.error_samples = []
+        self.lock = threading.Lock()
+
+    def record(self, action, seconds, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies[action].append(seconds)
+            else:
+                self.errors[action] += 1
+                if len(self.error_samples) < 5:
+                    self.error_samples.append(f"{action}: {type(error).__name__}: {error}")
+
+
+class ActivitySampler(threading.Thread):
+    """Polls pg_stat_activity and the app pool every ``interval`` seconds."""
+
+    def __init__(self, interval):
+        super().__init__(name="activity-sampler", daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        with psycopg.connect(**DB_CONFIG, autocommit=True) as conn:
+            while not self.stopped.is_set():
+                total, active, idle, idle_in_transaction = conn.execute(ACTIVITY_SQL).fetchone()
+                pool = db._pool.get_stats() if db._pool is not None else {}
+                self.samples.append({
+                    "total": total,
+                    "active": active,
+                    "idle": idle,
+                    "idle_in_transaction": idle_in_transaction,
+                    "pool_waiting": pool.get("requests_waiting", 0),
+                })
+                self.stopped.wait(self.interval)
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        return {
+            key: {"max": max(s[key] for s in self.samples), "mean": round(statistics.fmean(s[key] for s in self.samples), 2)}
+            for key in self.samples[0]
+        }
+
+
+def session_loop(driver, config, mix, recorder, deadline, rng):
+    try:
+        session = DRIVERS[driver](config, rng)
+    except Exception as exc:  # noqa: BLE001
+        recorder.record("browse", 0.0, exc)
+        return
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        action = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            getattr(session, action)()
+        except Exception as exc:  # noqa: BLE001
+            recorder.record(action, time.perf_counter() - started, exc)
+        else:
+            recorder.record(action, time.perf_counter() - started)
+        if config["think_ms"]:
+            time.sleep(min(rng.expovariate(1000 / config["think_ms"]), max(0.0, deadline - time.perf_counter())))
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed):
+    actions = {}
+    for name in ACTIONS:
+        values = sorted(recorder.latencies[name])
+        if not values and not recorder.errors[name]:
+            continue
+        stats = {"count": len(values), "errors": recorder.errors[name], "per_sec": round(len(values) / elapsed, 2)}
+        if values:
+            stats.update({f"p{p}_ms": round(percentile(values, p) * 1000, 2) for p in PERCENTILES})
+            stats["max_ms"] = round(values[-1] * 1000, 2)
+            stats["mean_ms"] = round(statistics.fmean(values) * 1000, 2)
+        actions[name] = stats
+    total = sum(len(v) for v in recorder.latencies.values())
+    return {"throughput_per_sec": round(total / elapsed, 2), "actions": actions}
+
+
+def run_level(sessions, args, config, mix):
+    recorder = Recorder()
+    sampler = ActivitySampler(args.sample_interval)
+    sampler.start()
+    started = time.perf_counter()
+    deadline = started + args.ramp_up + args.duration
+    threads = []
+    for i in range(sessions):
+        rng = random.Random(args.seed * 1000 + i)
+        thread = threading.Thread(
+            target=session_loop, args=(args.driver, config, mix, recorder, deadline, rng), daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+        if args.ramp_up:
+            time.sleep(args.ramp_up / sessions)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    sampler.stopped.set()
+    sampler.join()
+    result = {"sessions": sessions, "seconds": round(elapsed, 2)}
+    result.update(summarize(recorder, elapsed))
+    result["connections"] = sampler.summary()
+    if recorder.error_samples:
+        result["error_samples"] = recorder.error_samples
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10], help="concurrent sessions per level")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per level")
+    parser.add_argument("--ramp-up", type=float, default=0, help="seconds over which sessions start")
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="direct")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"default {DEFAULT_MIX}")
+    parser.add_argument("--think-ms", type=float, default=100, help="mean pause between a session's actions")
+    parser.add_argument("--limit", type=int, default=10, help="rows per browse page")
+    parser.add_argument("--no-cache", action="store_true", help="expire the app's query cache immediately")
+    parser.add_argument("--write-id-base", type=int, default=2_000_000_000)
+    parser.add_argument("--timeout", type=float, default=30, help="apptest: seconds per script run")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append the JSON report to this file, one line per run")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        get_cache().ttl = 0
+    with psycopg.connect(**DB_CONFIG) as conn:
+        max_id = conn.execute("SELECT coalesce(max(order_id), 1) FROM public.orders WHERE order_id < %s",
+                              (args.write_id_base,)).fetchone()[0]
+        max_connections = int(conn.execute("SHOW max_connections").fetchone()[0])
+    config = {
+        "limit": args.limit,
+        "max_id": max_id,
+        "write_id_base": args.write_id_base,
+        "think_ms": args.think_ms,
+        "timeout": args.timeout,
+    }
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "driver": args.driver,
+        "mix": args.mix,
+        "think_ms": args.think_ms,
+        "cache": not args.no_cache,
+        "pool_max_size": db.POOL_MAX_SIZE,
+        "max_connections": max_connections,
+        "levels": [],
+    }
+    try:
+        for sessions in args.sessions:
+            report["levels"].append(run_level(sessions, args, config, args.mix))
+    finally:
+        with psycopg.connect(**DB_CONFIG) as conn:
+            conn.execute("DELETE FROM public.orders WHERE order_id >= %s", (args.write_id_base,))
+        db.close()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "a") as fh:
+            fh.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("orders_admin")
+
+SLOW_QUERY_MS = float(os.getenv("ORDERS_SLOW_QUERY_MS", "500"))
+METRICS_FILE = os.getenv("ORDERS_METRICS_FILE")
+METRICS_PORT = os.getenv("ORDERS_METRICS_PORT")
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Stage:
+    """One timed stage; set ``rows``/``bytes`` inside the ``timed`` block."""
+
+    def __init__(self, stage, query):
+        self.stage = stage
+        self.query = query
+        self.rows = None
+        self.bytes = None
+        self.seconds = 0.0
+
+
+class Registry:
+    """Per (stage, query) latency histograms plus row and byte totals."""
+
+    def __init__(self):
+        self._series = {}
+        self._slow = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage):
+        with self._lock:
+            series = self._series.setdefault(
+                (stage.stage, stage.query),
+                {"count": 0, "sum": 0.0, "rows": 0, "bytes": 0, "buckets": [0] * len(BUCKETS)},
+            )
+            series["count"] += 1
+            series["sum"] += stage.seconds
+            series["rows"] += stage.rows or 0
+            series["bytes"] += stage.bytes or 0
+            for i, bound in enumerate(BUCKETS):
+                if stage.seconds <= bound:
+                    series["buckets"][i] += 1
+
+    def observe_slow(self, query):
+        with self._lock:
+            self._slow[query] = self._slow.get(query, 0) + 1
+
+    def render(self, gauges=None):
+        """Prometheus text exposition of everything recorded so far."""
+        with self._lock:
+            series = {key: dict(value, buckets=list(value["buckets"])) for key, value in self._series.items()}
+            slow = dict(self._slow)
+
+        lines = [
+            "# HELP orders_admin_stage_seconds Time spent per stage and query.",
+            "# TYPE orders_admin_stage_seconds histogram",
+        ]
+        for (stage, query), value in sorted(series.items()):
+            labels = f'stage="{stage}",query="{query}"'
+            for bound, count in zip(BUCKETS, value["buckets"]):
+                lines.append(f'orders_admin_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'orders_admin_stage_seconds_bucket{{{labels},le="+Inf"}} {value["count"]}')
+            lines.append(f"orders_admin_stage_seconds_sum{{{labels}}} {value['sum']:.6f}")
+            lines.append(f"orders_admin_stage_seconds_count{{{labels}}} {value['count']}")
+        for name, field in (("rows", "rows"), ("bytes", "bytes")):
+            lines.append(f"# HELP orders_admin_stage_{name}_total {name.capitalize()} handled per stage and query.")
+            lines.append(f"# TYPE orders_admin_stage_{name}_total counter")
+            for (stage, query), value in sorted(series.items()):
+                lines.append(f'orders_admin_stage_{name}_total{{stage="{stage}",query="{query}"}} {value[field]}')
+        lines.append("# HELP orders_admin_slow_queries_total Queries slower than ORDERS_SLOW_QUERY_MS.")
+        lines.append("# TYPE orders_admin_slow_queries_total counter")
+        for query, count in sorted(slow.items()):
+            lines.append(f'orders_admin_slow_queries_total{{query="{query}"}} {count}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def log_event(event, **fields):
+    logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+@contextmanager
+def timed(stage, query):
+    """Time the block, then record it and emit a structured log line."""
+    record = Stage(stage, query)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        REGISTRY.observe(record)
+        log_event(
+            "stage",
+            stage=stage,
+            query=query,
+            ms=round(record.seconds * 1000, 3),
+            rows=record.rows,
+            bytes=record.bytes,
+        )
+
+
+def report_slow_query(query, elapsed_ms, sql, plan):
+    REGISTRY.observe_slow(query)
+    logger.warning(
+        json.dumps(
+            {
+                "event": "slow_query",
+                "query": query,
+                "ms": round(elapsed_ms, 3),
+                "threshold_ms": SLOW_QUERY_MS,
+                "sql": " ".join(sql.split()),
+                "plan": plan,
+            }
+        )
+    )
+
+
+def export(gauges=None):
+    """Write the exposition to ORDERS_METRICS_FILE, if configured."""
+    if not METRICS_FILE:
+        return
+    tmp_path = f"{METRICS_FILE}.tmp"
+    with open(tmp_path, "w") as fh:
+        fh.write(REGISTRY.render(gauges))
+    os.replace(tmp_path, METRICS_FILE)
+
+
+def start_http_server(gauges=None):
+    """Serve ``/metrics`` on ORDERS_METRICS_PORT from a daemon thread.
+
+    ``gauges`` is a callable returning extra gauge values at scrape time.
+    """
+    if not METRICS_PORT:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render(gauges() if gauges else None).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", int(METRICS_PORT)), Handler)
+    threading.Thread(target=server.serve_forever, name="orders-metrics", daemon=True).start()
+    return server
+
+
+def configure_logging():
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(os.getenv("ORDERS_LOG_LEVEL", "INFO"))
+    logger.propagate = False
@@ -0,0 +1,222 @@
+"""Scale-factor synthetic orders for public.orders, loaded with COPY.
+
+Scale factor 1 is 1M orders, so ``--scale 100`` builds a 100M-row table. The
+data has the skew real order tables have:
+
+- customers: 20k per scale factor, with power-law order counts, so a few
+  customers have thousands of orders and most have a handful;
+- plants (24, ``1001``-``1024``) and products (5,000) are also power-law, and
+  each product has its own list price;
+- order dates grow over the period (more recent orders), fall mostly on
+  weekdays and in working hours;
+- status follows age: old orders are ``Delivered``, recent ones still
+  ``Placed``, ``In Production`` or ``Shipped``;
+- ``total_price`` is exactly ``quantity * unit_price``.
+
+Orders are generated in chunks of ``--chunk-rows`` consecutive ORDER_IDs.
+Each chunk is seeded from ``--seed`` and its index, so the data does not
+depend on ``--workers``. Worker processes stream the chunks into Postgres
+with ``COPY ... FROM STDIN`` on their own connections and commit each one.
+The run reports rows/sec as JSON.
+
+    python order_generator.py --scale 1
+    python order_generator.py --scale 100 --workers 8 --truncate --no-triggers
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import numpy as np
+import psycopg
+
+from db import DB_CONFIG
+
+ROWS_PER_SCALE = 1_000_000
+CUSTOMERS_PER_SCALE = 20_000
+N_PLANTS = 24
+N_PRODUCTS = 5_000
+CUSTOMER_SKEW = 0.7
+PLANT_SKEW = 0.8
+PRODUCT_SKEW = 1.0
+# Share of orders per status by age in days: (max age, {status: share}).
+STATUS_BY_AGE = [
+    (7, {"Placed": 0.6, "In Production": 0.35, "Shipped": 0.05}),
+    (30, {"Placed": 0.15, "In Production": 0.5, "Shipped": 0.3, "Delivered": 0.05}),
+    (60, {"In Production": 0.1, "Shipped": 0.4, "Delivered": 0.5}),
+    (None, {"Shipped": 0.02, "Delivered": 0.98}),
+]
+STATUSES = ["Placed", "In Production", "Shipped", "Delivered"]
+COLUMNS = [
+    "order_id", "customer_id", "mfg_plant_id", "order_date", "order_status",
+    "product_id", "quantity", "total_price", "unit_price",
+]
+COPY_SQL = f"COPY public.orders ({', '.join(COLUMNS)}) FROM STDIN (FORMAT csv)"
+
+
+def power_law_cdf(n, skew):
+    """CDF over ranks ``0..n-1`` with weight ``1 / (rank + 1) ** skew``."""
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** skew)
+    return cdf / cdf[-1]
+
+
+def draw(cdf, size, rng):
+    return np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1)
+
+
+class Catalog:
+    """The fixed parts of a dataset: skew tables, product prices and the date range."""
+
+    def __init__(self, scale, seed, start, end):
+        rng = np.random.default_rng([seed, 0])
+        self.n_customers = max(1, int(CUSTOMERS_PER_SCALE * scale))
+        self.customer_cdf = power_law_cdf(self.n_customers, CUSTOMER_SKEW)
+        # Spread the busiest customers over the id range instead of ids 1, 2, 3...
+        self.customer_ids = rng.permutation(self.n_customers) + 100_000
+        self.plant_cdf = power_law_cdf(N_PLANTS, PLANT_SKEW)
+        self.plant_ids = rng.permutation(N_PLANTS) + 1001
+        self.product_cdf = power_law_cdf(N_PRODUCTS, PRODUCT_SKEW)
+        self.product_ids = rng.permutation(N_PRODUCTS) + 10_001
+        # List prices from about 20k to 900k dollars, like the sample rows.
+        self.list_prices = np.maximum(rng.lognormal(np.log(110_000), 0.7, N_PRODUCTS), 5_000)
+        self.start = np.datetime64(start, "s")
+        self.end = np.datetime64(end, "s")
+
+    def orders(self, first_id, rows, rng):
+        """``rows`` orders with ids ``first_id..first_id + rows - 1``, as ``{column: array}``."""
+        span = (self.end - self.start).astype(np.int64)
+        # Density grows linearly over the period: the square root of a uniform.
+        days = np.floor(np.sqrt(rng.random(rows)) * (span // 86400)).astype(np.int64)
+        weekday = (days + self.start.astype("M8[D]").astype(np.int64) + 3) % 7
+        # Most weekend orders move to a weekday of the same week.
+        moved = (weekday >= 5) & (rng.random(rows) < 0.8)
+        days = np.maximum(days - np.where(moved, weekday - rng.integers(0, 5, rows), 0), 0)
+        seconds = np.clip(rng.normal(13 * 3600, 3 * 3600, rows), 6 * 3600, 22 * 3600).astype(np.int64)
+        order_date = self.start + (days * 86400 + seconds).astype("m8[s]")
+
+        age = (self.end - order_date).astype("m8[D]").astype(np.int64)
+        status = np.empty(rows, dtype=np.int8)
+        lower = -1
+        u = rng.random(rows)
+        for max_age, shares in STATUS_BY_AGE:
+            in_band = age > lower if max_age is None else (age > lower) & (age <= max_age)
+            cdf = np.cumsum([shares.get(name, 0.0) for name in STATUSES])
+            status[in_band] = np.searchsorted(cdf, u[in_band] * cdf[-1], side="right")
+            lower = max_age
+
+        product = draw(self.product_cdf, rows, rng)
+        # Negotiated prices within 10% of list, to the dollar.
+        unit_price = np.round(self.list_prices[product] * rng.uniform(0.9, 1.1, rows)).astype(np.int64)
+        quantity = np.minimum(rng.geometric(0.55, rows), 50)
+        return {
+            "order_id": np.arange(first_id, first_id + rows),
+            "customer_id": self.customer_ids[draw(self.customer_cdf, rows, rng)],
+            "mfg_plant_id": self.plant_ids[draw(self.plant_cdf, rows, rng)],
+            "order_date": order_date,
+            "order_status": status,
+            "product_id": self.product_ids[product],
+            "quantity": quantity,
+            "total_price": quantity * unit_price,
+            "unit_price": unit_price,
+        }
+
+
+def copy_text(orders):
+    """The orders as COPY CSV text, in ``COLUMNS`` order."""
+    columns = dict(orders)
+    columns["order_date"] = np.datetime_as_string(orders["order_date"])
+    columns["order_status"] = np.asarray(STATUSES, dtype=object)[orders["order_status"]]
+    # Formatting plain Python values row by row is about 3x faster than DataFrame.to_csv here.
+    row = ",".join("{}" for _ in COLUMNS) + "\n"
+    return "".join(map(row.format, *(columns[name].tolist() for name in COLUMNS)))
+
+
+_catalog = None
+
+
+def _init_worker(scale, seed, start, end):
+    global _catalog
+    _catalog = Catalog(scale, seed, start, end)
+
+
+def load_chunk(chunk, first_id, rows, seed):
+    """Generate one chunk and COPY it in its own transaction; returns (rows, seconds)."""
+    started = time.perf_counter()
+    text = copy_text(_catalog.orders(first_id, rows, np.random.default_rng([seed, chunk + 1])))
+    with psycopg.connect(**DB_CONFIG) as conn:
+        with conn.cursor().copy(COPY_SQL) as copy:
+            copy.write(text)
+    return rows, time.perf_counter() - started
+
+
+def prepare(truncate, no_triggers):
+    """Optional setup before the load; returns the next free ORDER_ID."""
+    with psycopg.connect(**DB_CONFIG) as conn:
+        if truncate:
+            conn.execute("TRUNCATE public.orders")
+        if no_triggers:
+            # Checked here, once, so a missing privilege fails before any data is written.
+            conn.execute("SET session_replication_role = replica")
+        return conn.execute("SELECT coalesce(max(order_id), 0) + 1 FROM public.orders").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1, help="millions of orders")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-rows", type=int, default=250_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start-date", default="2021-01-01")
+    parser.add_argument("--end-date", default=datetime.now().strftime("%Y-%m-%d"))
+    parser.add_argument("--first-id", type=int, help="first ORDER_ID (default: after the current maximum)")
+    parser.add_argument("--truncate", action="store_true", help="empty public.orders first")
+    parser.add_argument(
+        "--no-triggers",
+        action="store_true",
+        help="skip row triggers such as the CDC change log while loading (needs superuser)",
+    )
+    args = parser.parse_args()
+
+    first_id = prepare(args.truncate, args.no_triggers)
+    if args.first_id is not None:
+        first_id = args.first_id
+    total = int(args.scale * ROWS_PER_SCALE)
+    chunks = [
+        (i, first_id + offset, min(args.chunk_rows, total - offset), args.seed)
+        for i, offset in enumerate(range(0, total, args.chunk_rows))
+    ]
+    end = datetime.strptime(args.end_date, "%Y-%m-%d") + timedelta(days=1)
+    if args.no_triggers:
+        os.environ["PGOPTIONS"] = f"{os.getenv('PGOPTIONS', '')} -c session_replication_role=replica".strip()
+
+    started = time.perf_counter()
+    loaded = busy = 0
+    initargs = (args.scale, args.seed, args.start_date, end.strftime("%Y-%m-%d"))
+    with Pool(max(1, args.workers), initializer=_init_worker, initargs=initargs) as pool:
+        for rows, seconds in pool.starmap(load_chunk, chunks, chunksize=1):
+            loaded += rows
+            busy += seconds
+    elapsed = time.perf_counter() - started
+
+    with psycopg.connect(**DB_CONFIG, autocommit=True) as conn:
+        analyze_started = time.perf_counter()
+        conn.execute("ANALYZE public.orders")
+        analyze_seconds = time.perf_counter() - analyze_started
+
+    print(json.dumps({
+        "rows": loaded,
+        "first_order_id": first_id,
+        "last_order_id": first_id + loaded - 1,
+        "chunks": len(chunks),
+        "workers": args.workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(loaded / elapsed),
+        "rows_per_sec_per_worker": round(loaded / busy) if busy else None,
+        "analyze_seconds": round(analyze_seconds, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+
+class QueryCache:
+    """In-process read cache for order queries.
+
+    Entries are keyed on the query name and its parameters, expire after
+    ``ttl`` seconds and are evicted least-recently-used once ``maxsize`` is
+    reached. Each entry remembers which order ids it could contain so that a
+    write only drops the entries it can affect.
+    """
+
+    def __init__(self, ttl=30.0, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            rows, _, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def put(self, key, rows, covers, generation=None):
+        """Store ``rows`` under ``key``.
+
+        ``covers(order_id)`` must return True when a write to ``order_id``
+        could change the cached result. Pass the ``generation`` read before
+        running the query so a result that raced with a write is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (rows, covers, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_order(self, order_id):
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, (_, covers, _) in self._entries.items() if covers(order_id)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+@st.cache_resource
+def get_cache():
+    """The cache shared by every session and rerun of this server process.
+
+    Created here rather than in app.py, whose top level runs again on every
+    rerun. Size and expiry come from ORDERS_CACHE_TTL and ORDERS_CACHE_MAXSIZE.
+    """
+    return QueryCache(
+        ttl=float(os.getenv("ORDERS_CACHE_TTL", "30")),
+        maxsize=int(os.getenv("ORDERS_CACHE_MAXSIZE", "256")),
+    )
+
+
+def covers_all(order_id):
+    """Invalidation predicate for aggregates that any write can change."""
+    return True
+
+
+def covers_order(order_id):
+    """Invalidation predicate for a lookup of a single order."""
+    return lambda changed_id: changed_id == order_id
+
+
+def covers_page(rows, limit):
+    """Invalidation predicate for an ``ORDER BY order_id LIMIT n`` page.
+
+    A full page only changes when the written id sorts at or before its last
+    row; a short page holds the whole table, so any write can change it.
+    """
+    if len(rows) < limit:
+        return lambda changed_id: True
+    last_id = rows[-1]["order_id"]
+    return lambda changed_id: changed_id <= last_id
+
+
+class NotifyListener(threading.Thread):
+    """Drops cache entries when another replica announces a write.
+
+    Writers run ``NOTIFY <channel>, '<order_id>'`` inside the write
+    transaction, so the notification is only delivered after commit.
+    """
+
+    def __init__(self, connect, channel, cache, retry_interval=5.0):
+        super().__init__(name=f"listen-{channel}", daemon=True)
+        self.connect = connect
+        self.channel = channel
+        self.cache = cache
+        self.retry_interval = retry_interval
+
+    def run(self):
+        while True:
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                conn.execute(f"LISTEN {self.channel}")
+                # Anything written while we were disconnected is unknown.
+                self.cache.clear()
+                for notify in conn.notifies():
+                    try:
+                        self.cache.invalidate_order(int(notify.payload))
+                    except ValueError:
+                        self.cache.clear()
+            except Exception:  # noqa: BLE001
+                if conn is not None:
+                    conn.close()
+                time.sleep(self.retry_interval)
@@ -0,0 +1,337 @@
+"""Convert the JSON and CSV loading samples to Parquet before staging them.
+
+The sample files (``03-loading/SNOWBANK_PUBLIC_ACCOUNTS_*.json``,
+``06-advance-sql/SNOWBANK_PUBLIC_ACCOUNTS_*.json``, ``03-loading/data_0_0_0.csv``)
+are read incrementally, never whole: JSON arrays (or newline-delimited JSON) a
+record at a time, CSV a block at a time with pyarrow's streaming reader.
+
+A first pass infers each file's schema and merges them into one. Columns that
+only some files have, like ``ACCOUNT_CHANGE_DATE`` in the schema evolution
+sample, are added to the merged schema and are null in the other files'
+rows. Integers seen as floats elsewhere become floats, and any other type
+conflict becomes a string. The second pass writes zstd Parquet with that
+schema, ``--row-group-rows`` rows per row group, starting a new file at the
+first row group boundary past ``--target-mb`` so ``COPY INTO`` can load the
+files in parallel.
+Both passes run one file per worker process. The run ends with the input
+MB/s and each worker's peak RSS, and writes ``_manifest.json`` with the merged
+schema (as Snowflake column types) and the output files.
+
+    python prestage.py 06-advance-sql/SNOWBANK_PUBLIC_ACCOUNTS_*.json --out stage/accounts
+    python prestage.py 03-loading/data_0_0_0.csv --out stage/accounts_csv
+    python prestage.py 03-loading/*.json --schema-only
+
+Then, in Snowflake::
+
+    PUT file://stage/accounts/*.parquet @JSON_FILES_STAGE;
+    COPY INTO ACCOUNTS_SCHEMA_EVOLUTION FROM @JSON_FILES_STAGE
+      FILE_FORMAT = (TYPE = PARQUET) MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;
+"""
+import argparse
+import codecs
+import json
+import os
+import resource
+import time
+from multiprocessing import Pool
+
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = "_manifest.json"
+READ_BYTES = 1024 * 1024
+PARSE_ROWS = 8192
+# data_0_0_0.csv has no header row; these are the ACCOUNTS_RAW columns it is loaded into.
+ACCOUNTS_RAW_COLUMNS = [
+    "ACCESSIBLE_BALANCE", "ACCOUNT_BALANCE", "ACCOUNT_STATUS_CODE", "ACCOUNT_UID",
+    "CDIC_HOLD_STATUS_CODE", "CURRENCY_CODE", "CURRENT_CDIC_HOLD_AMOUNT", "DEPOSITOR_ID",
+    "INSURANCE_DETERMINATION_CATEGORY_TYPE_CODE", "PRODUCT_CODE", "REGISTERED_ACCOUNT_FLAG",
+    "REGISTERED_PLAN_TYPE_CODE", "FILE_NAME", "FILE_ROW_NUMBER",
+]
+
+
+def iter_json_records(path):
+    """Yield the objects of a JSON array, or of newline-delimited JSON, one at a time."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, eof, in_array = "", 0, False, None
+    with open(path, "rb") as fh:
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+                pos += 1
+            if pos < len(buffer):
+                if in_array is None:
+                    in_array = buffer[pos] == "["
+                    pos += in_array
+                    continue
+                if in_array and buffer[pos] == "]":
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    pos = end
+                    yield record
+                    continue
+            elif eof:
+                return
+            # Need more input: drop what has been parsed and read the next chunk.
+            chunk = fh.read(READ_BYTES)
+            eof = not chunk
+            buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+
+
+def iter_json_batches(path, rows):
+    # Records are converted to Arrow PARSE_ROWS at a time, so only that many
+    # Python dicts are alive at once however large the row group is.
+    tables, pending, batch = [], 0, []
+    for record in iter_json_records(path):
+        batch.append(record)
+        if len(batch) >= PARSE_ROWS:
+            tables.append(_json_table(batch))
+            pending += len(batch)
+            batch = []
+            if pending >= rows:
+                yield _concat(tables)
+                tables, pending = [], 0
+    if batch:
+        tables.append(_json_table(batch))
+    if tables:
+        yield _concat(tables)
+
+
+def _concat(tables):
+    schema = pa.schema([])
+    for table in tables:
+        schema = merge_schemas(schema, table.schema)
+    return pa.concat_tables([conform(table, schema) for table in tables])
+
+
+def _json_table(records):
+    try:
+        return pa.Table.from_pylist(records)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types within a column: keep that column as its JSON text.
+        columns = {}
+        for record in records:
+            for name in record:
+                columns.setdefault(name, None)
+        for name in columns:
+            values = [record.get(name) for record in records]
+            try:
+                columns[name] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                columns[name] = pa.array(
+                    [v if v is None or isinstance(v, str) else json.dumps(v) for v in values], pa.string()
+                )
+        return pa.table(columns)
+
+
+def iter_csv_batches(path, rows, column_types=None, header=False):
+    read_options = pcsv.ReadOptions(
+        column_names=None if header else ACCOUNTS_RAW_COLUMNS, block_size=READ_BYTES
+    )
+    convert_options = pcsv.ConvertOptions(column_types=column_types) if column_types else None
+    reader = pcsv.open_csv(path, read_options=read_options, convert_options=convert_options)
+    pending, pending_rows = [], 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= rows:
+            yield pa.Table.from_batches(pending)
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+
+def iter_batches(path, rows, column_types=None, csv_header=False):
+    """Tables of about ``rows`` rows; ``column_types`` fixes the CSV column types."""
+    if path.endswith(".csv"):
+        return iter_csv_batches(path, rows, column_types, csv_header)
+    return iter_json_batches(path, rows)
+
+
+def merge_types(a, b):
+    if a == b or pa.types.is_null(b):
+        return a
+    if pa.types.is_null(a):
+        return b
+    if (pa.types.is_integer(a) or pa.types.is_floating(a)) and (pa.types.is_integer(b) or pa.types.is_floating(b)):
+        return pa.float64()
+    return pa.string()
+
+
+def merge_schemas(a, b):
+    """Union of the columns of ``a`` and ``b`` in first-seen order, with merged types."""
+    types = {field.name: field.type for field in a}
+    for field in b:
+        types[field.name] = merge_types(types[field.name], field.type) if field.name in types else field.type
+    return pa.schema(list(types.items()))
+
+
+def infer_file(path, rows, csv_header):
+    """Pass 1: the merged schema and row count of one file."""
+    schema, count = pa.schema([]), 0
+    try:
+        for table in iter_batches(path, rows, csv_header=csv_header):
+            schema = merge_schemas(schema, table.schema)
+            count += table.num_rows
+    except pa.ArrowInvalid:
+        if not path.endswith(".csv"):
+            raise
+        # A later CSV block didn't fit the types inferred from the first: read it all as text.
+        names = next(iter_csv_batches(path, 1, header=csv_header)).column_names
+        text = {name: pa.string() for name in names}
+        schema = pa.schema(list(text.items()))
+        count = sum(table.num_rows for table in iter_csv_batches(path, rows, text, csv_header))
+    return {"path": path, "schema": schema, "rows": count, "peak_rss_mb": peak_rss_mb()}
+
+
+def convert_file(path, name, schema, out_dir, rows, target_bytes, csv_header):
+    """Pass 2: write one input file as Parquet parts of about ``target_bytes`` each."""
+    started = time.perf_counter()
+    parts, writer, fh, count = [], None, None, 0
+
+    def finish():
+        writer.close()
+        fh.close()
+        final_path = fh.name[: -len(".tmp")]
+        os.replace(fh.name, final_path)
+        parts.append({"file": os.path.basename(final_path), "bytes": os.path.getsize(final_path)})
+
+    column_types = {field.name: field.type for field in schema}
+    for table in iter_batches(path, rows, column_types, csv_header):
+        table = conform(table, schema)
+        if writer is None:
+            fh = open(os.path.join(out_dir, f"{name}_{len(parts):04d}.parquet.tmp"), "wb")
+            writer = pq.ParquetWriter(fh, schema, compression="zstd")
+        writer.write_table(table, row_group_size=rows)
+        count += table.num_rows
+        if fh.tell() >= target_bytes:
+            finish()
+            writer = None
+    if writer is not None:
+        finish()
+    return {
+        "path": path,
+        "rows": count,
+        "input_bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - started, 3),
+        "parts": parts,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def conform(table, schema):
+    """``table`` with exactly the columns of ``schema``: missing ones null, all cast."""
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table[field.name].cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def snowflake_type(arrow_type):
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "NUMBER(38,0)"
+    if pa.types.is_floating(arrow_type):
+        return "FLOAT"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP_NTZ"
+    if pa.types.is_struct(arrow_type) or pa.types.is_list(arrow_type):
+        return "VARIANT"
+    return "VARCHAR"
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def output_names(paths):
+    """File stem per input, prefixed with its directory when two inputs share a stem."""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    return {
+        path: stem if stems.count(stem) == 1 else f"{os.path.basename(os.path.dirname(os.path.abspath(path)))}_{stem}"
+        for path, stem in zip(paths, stems)
+    }
+
+
+def run(args):
+    started = time.perf_counter()
+    # Largest first, so the long files don't end up last in the queue.
+    paths = sorted(args.inputs, key=os.path.getsize, reverse=True)
+    with Pool(min(args.workers, len(paths))) as pool:
+        inferred = pool.starmap(infer_file, [(path, args.row_group_rows, args.csv_header) for path in paths])
+        schema = pa.schema([])
+        for result in sorted(inferred, key=lambda r: args.inputs.index(r["path"])):
+            schema = merge_schemas(schema, result["schema"])
+        # Parquet has no null type; a column that is null everywhere is written as a string.
+        schema = pa.schema([(f.name, pa.string() if pa.types.is_null(f.type) else f.type) for f in schema])
+        columns = [{"name": f.name, "arrow_type": str(f.type), "snowflake_type": snowflake_type(f.type)} for f in schema]
+        if args.schema_only:
+            return {"rows": sum(r["rows"] for r in inferred), "columns": columns}
+
+        os.makedirs(args.out, exist_ok=True)
+        names = output_names(args.inputs)
+        target_bytes = int(args.target_mb * 1024 * 1024)
+        converted = pool.starmap(
+            convert_file,
+            [(path, names[path], schema, args.out, args.row_group_rows, target_bytes, args.csv_header) for path in paths],
+        )
+
+    elapsed = time.perf_counter() - started
+    input_bytes = sum(r["input_bytes"] for r in converted)
+    report = {
+        "files": len(converted),
+        "rows": sum(r["rows"] for r in converted),
+        "input_mb": round(input_bytes / 2**20, 2),
+        "output_mb": round(sum(p["bytes"] for r in converted for p in r["parts"]) / 2**20, 2),
+        "seconds": round(elapsed, 3),
+        "mb_per_sec": round(input_bytes / 2**20 / elapsed, 2),
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in inferred + converted),
+        "columns": columns,
+        "inputs": converted,
+    }
+    path = os.path.join(args.out, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w") as fh:
+        json.dump(report, fh, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="JSON (array or one object per line) and CSV files")
+    parser.add_argument("--out", default="stage")
+    parser.add_argument("--target-mb", type=float, default=128, help="start a new Parquet file after this many MB")
+    parser.add_argument("--row-group-rows", type=int, default=128 * 1024)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--csv-header", action="store_true", help="CSV files have a header row")
+    parser.add_argument("--schema-only", action="store_true", help="print the merged schema and stop")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.schema_only:
+        width = max(len(c["name"]) for c in report["columns"])
+        print(f"{report['rows']:,} rows")
+        print(",\n".join(f"    {c['name']:<{width}} {c['snowflake_type']}" for c in report["columns"]))
+        return
+    for result in report["inputs"]:
+        print(f"{result['path']}: {result['rows']:,} rows -> {len(result['parts'])} file(s) in {result['seconds']}s")
+    print(
+        f"{report['rows']:,} rows, {report['input_mb']} MB -> {report['output_mb']} MB Parquet "
+        f"in {report['seconds']}s ({report['mb_per_sec']} MB/s), peak RSS {report['peak_rss_mb']} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
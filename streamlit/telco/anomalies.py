@@ -0,0 +1,185 @@
+"""Batch anomaly detection over the monthly usage history.
+
+The long ``usage_history`` table is pivoted once into a customers x months
+matrix per metric (``np.bincount`` on the flat cell index, so duplicate rows
+for a month are summed). Every cell then gets a z-score against the
+customer's previous ``window`` months and a month-over-month change, using
+cumulative sums along the month axis. No Python loop runs per customer, so
+10M customer-months take a few seconds.
+
+A mean and standard deviation estimated from only ``window`` months are
+noisy, so the score is Student-t rather than normal distributed: on pure
+noise, |z| >= 3 would flag around 10% of cells with a 3-month window. The
+score uses the sample standard deviation widened for a new observation, and
+cells are flagged beyond ``critical_value(window, Z_THRESHOLD)``, the cutoff
+that noise crosses as rarely as a normal |z| crosses ``Z_THRESHOLD``. The
+spread is not floored: small spreads are what make the t tail heavy, and the
+cutoff already allows for them. ``--check-noise`` checks the flag rate on
+simulated noise against that target.
+
+    python anomalies.py --top 20
+    python anomalies.py --check-noise
+"""
+import argparse
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+METRICS = ['data_gb', 'voice_minutes', 'sms_count', 'revenue']
+WINDOW = 3
+# Flag as rarely as |z| >= Z_THRESHOLD would for a normal score (see critical_value).
+Z_THRESHOLD = 3.0
+# Flag a month-over-month change of at least this fraction (1.0 = doubled, or dropped to zero).
+MOM_THRESHOLD = 1.0
+# How far the z flag rate on noise may stray from the target, relative to it.
+NOISE_RATE_TOLERANCE = 0.1
+
+
+def to_matrix(usage_history_df, metrics=METRICS):
+    """Pivot to ({metric: customers x months array}, customer ids, months, present mask)."""
+    customer_codes, customers = pd.factorize(usage_history_df['customer_id'], sort=True)
+    month_codes, months = pd.factorize(usage_history_df['month'], sort=True)
+    shape = (len(customers), len(months))
+    cells = customer_codes.astype(np.int64) * shape[1] + month_codes
+    present = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape) > 0
+    matrices = {
+        metric: np.bincount(cells, weights=usage_history_df[metric].to_numpy(dtype=float),
+                            minlength=shape[0] * shape[1]).reshape(shape)
+        for metric in metrics
+    }
+    return matrices, pd.Index(customers), pd.Index(months), present
+
+
+def _window_sums(values, window):
+    """Sum of the previous ``window`` columns for every column (the column itself excluded)."""
+    cumulative = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=cumulative[:, 1:])
+    sums = cumulative[:, :-1].copy()
+    sums[:, window:] -= cumulative[:, :-1 - window]
+    return sums
+
+
+def t_tail(t, dof):
+    """P(|T| >= t) for Student's t with an integer ``dof`` (Abramowitz & Stegun 26.7.3-4)."""
+    theta = math.atan(abs(t) / math.sqrt(dof))
+    cos2 = math.cos(theta) ** 2
+    term = total = 1.0
+    for k in range(2 if dof % 2 else 1, dof - 1, 2):
+        term *= cos2 * k / (k + 1)
+        total += term
+    if dof % 2 == 0:
+        return 1.0 - math.sin(theta) * total
+    inner = math.sin(theta) * math.cos(theta) * total if dof > 1 else 0.0
+    return 1.0 - 2.0 / math.pi * (theta + inner)
+
+
+def critical_value(window=WINDOW, z_threshold=Z_THRESHOLD):
+    """|z| cutoff for a ``window``-month baseline with the false-alarm rate of a normal ``z_threshold``."""
+    target = 2 * NormalDist().cdf(-z_threshold)
+    low, high = 0.0, 1e6
+    for _ in range(200):
+        mid = (low + high) / 2
+        low, high = (mid, high) if t_tail(mid, window - 1) > target else (low, mid)
+    return high
+
+
+def noise_z_rate(customers=200_000, months=12, cv=0.2, window=WINDOW, z_threshold=Z_THRESHOLD, seed=0):
+    """Share of scored cells flagged by z on noise: customer level x normal(1, ``cv``) each month."""
+    rng = np.random.default_rng(seed)
+    matrix = rng.lognormal(3, 1, (customers, 1)) * rng.normal(1, cv, (customers, months))
+    z, _, _ = score(matrix, np.ones(matrix.shape, dtype=bool), window)
+    z = z[~np.isnan(z)]
+    return float((np.abs(z) >= critical_value(window, z_threshold)).mean())
+
+
+def score(matrix, present, window=WINDOW):
+    """Rolling z-score, rolling mean and month-over-month change for one metric matrix.
+
+    The z-score is ``(value - mean) / (s * sqrt(1 + 1 / window))`` with the
+    sample standard deviation ``s`` of the previous ``window`` months, which
+    is Student-t distributed with ``window - 1`` degrees of freedom on noise.
+    """
+    values = np.where(present, matrix, 0.0)
+    count = _window_sums(present.astype(float), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = _window_sums(values, window) / count
+        var = (_window_sums(values * values, window) - count * mean * mean) / (count - 1)
+        std = np.sqrt(np.maximum(var, 0)) * np.sqrt(1 + 1 / count)
+        z = np.where(present & (count >= window) & (std > 0), (matrix - mean) / std, np.nan)
+
+        mom = np.full(matrix.shape, np.nan)
+        previous = matrix[:, :-1]
+        mom[:, 1:] = np.where(present[:, 1:] & present[:, :-1] & (previous > 0),
+                              (matrix[:, 1:] - previous) / previous, np.nan)
+    return z, mean, mom
+
+
+def detect(usage_history_df, metrics=METRICS, window=WINDOW, z_threshold=Z_THRESHOLD,
+           mom_threshold=MOM_THRESHOLD):
+    """Every flagged (customer, month, metric), most extreme first."""
+    matrices, customers, months, present = to_matrix(usage_history_df, metrics)
+    z_cutoff = critical_value(window, z_threshold)
+    frames = []
+    for i, metric in enumerate(metrics):
+        matrix = matrices.pop(metric)
+        z, mean, mom = score(matrix, present, window)
+        with np.errstate(invalid='ignore'):
+            flagged = (np.abs(z) >= z_cutoff) | (np.abs(mom) >= mom_threshold)
+        rows, cols = np.nonzero(flagged)
+        frames.append(pd.DataFrame({
+            # Categoricals share the id/month labels instead of copying a string per row.
+            'customer_id': pd.Categorical.from_codes(rows, categories=customers),
+            'month': pd.Categorical.from_codes(cols, categories=months),
+            'metric': pd.Categorical.from_codes(np.full(len(rows), i), categories=metrics),
+            'value': matrix[rows, cols],
+            'baseline': mean[rows, cols],
+            'z_score': z[rows, cols],
+            'mom_change': mom[rows, cols],
+        }))
+    anomalies = pd.concat(frames, ignore_index=True)
+    severity = np.abs(anomalies['z_score'].to_numpy())
+    anomalies['severity'] = np.where(np.isnan(severity), 0.0, severity)
+    # Most extreme z-score first, then the largest month-over-month change.
+    order = np.lexsort((-np.abs(np.nan_to_num(anomalies['mom_change'].to_numpy())), -anomalies['severity'].to_numpy()))
+    return anomalies.take(order).reset_index(drop=True)
+
+
+@st.cache_data(max_entries=2, show_spinner="Scanning usage history for anomalies...")
+def get_anomalies(_usage_history_df, version):
+    """Anomalies for one data version; ``version`` is the cache key."""
+    return detect(_usage_history_df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usage', default='usage_history.csv')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--window', type=int, default=WINDOW)
+    parser.add_argument('--z', type=float, default=Z_THRESHOLD)
+    parser.add_argument('--mom', type=float, default=MOM_THRESHOLD)
+    parser.add_argument('--output', help='write every flagged row to this CSV')
+    parser.add_argument('--check-noise', action='store_true',
+                        help='check the z flag rate on simulated noise against the target, then exit')
+    args = parser.parse_args()
+
+    if args.check_noise:
+        target = 2 * NormalDist().cdf(-args.z)
+        for cv in (0.05, 0.2, 0.4):
+            rate = noise_z_rate(cv=cv, window=args.window, z_threshold=args.z)
+            if abs(rate - target) > NOISE_RATE_TOLERANCE * target:
+                raise SystemExit(f"z flag rate on noise (cv {cv}) is {rate:.5f}, target {target:.5f}")
+            print(f"z flag rate on noise (cv {cv}): {rate:.5f}, target {target:.5f}")
+        return
+
+    anomalies = detect(pd.read_csv(args.usage), window=args.window, z_threshold=args.z, mom_threshold=args.mom)
+    print(f"{len(anomalies):,} anomalies")
+    print(anomalies.head(args.top).to_string(index=False))
+    if args.output:
+        anomalies.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,15 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import seaborn as sns
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
-import os
+from datetime import datetime
+
+import anomalies
+import baselines
+import cohorts
+import figure_cache
+import profiler
+import worklist
+from data import data_version, load_data
+from lazy_imports import go, px, subplots
 
 # Page configuration
 st.set_page_config(
@@ -43,26 +45,23 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Load customer and usage data"""
-    # Check if data files exist, if not generate them
-    if not os.path.exists('customer_data.csv') or not os.path.exists('usage_history.csv'):
-        st.info("Generating sample data... This may take a moment.")
-        os.system('python data_generator.py')
-    
-    customers = pd.read_csv('customer_data.csv')
-    usage_history = pd.read_csv('usage_history.csv')
-    
-    # Convert date columns
-    customers['last_payment_date'] = pd.to_datetime(customers['last_payment_date'])
-    customers['last_support_date'] = pd.to_datetime(customers['last_support_date'])
-    
-    return customers, usage_history
+def show_chart(chart_id, build, customer_id=None):
+    """Render a chart through the shared figure cache; ``build()`` makes it on a miss"""
+    key = (chart_id, customer_id, data_version())
+    fig = figure_cache.get_cache().figure(key, build)
+    profiler.plotly_chart(fig, use_container_width=True)
+
+def search_customers(customers_df, customer_search):
+    """Customers whose ID or name contains the search text"""
+    return customers_df[
+        customers_df['customer_id'].str.contains(customer_search, case=False) |
+        customers_df['first_name'].str.contains(customer_search, case=False) |
+        customers_df['last_name'].str.contains(customer_search, case=False)
+    ]
 
 def main():
     # Load data
-    customers_df, usage_history_df = load_data()
+    customers_df, usage_history_df = load_data(data_version())
     
     # Sidebar navigation
     st.sidebar.markdown("## 🏢 TelcoCorp Dashboard")
@@ -70,7 +69,8 @@ def main():
     
     page = st.sidebar.selectbox(
         "Navigate to:",
-        ["🏠 Customer Overview", "📊 Service Usage Analytics", "💰 Billing & Revenue", "⚠️ Customer Risk & Retention"]
+        ["🏠 Customer Overview", "📊 Service Usage Analytics", "💰 Billing & Revenue", "⚠️ Customer Risk & Retention",
+         "📈 Cohort Analysis"]
     )
     
     # Customer selector in sidebar
@@ -78,11 +78,7 @@ def main():
     customer_search = st.sidebar.text_input("Search Customer ID or Name:")
     
     if customer_search:
-        filtered_customers = customers_df[
-            customers_df['customer_id'].str.contains(customer_search, case=False) |
-            customers_df['first_name'].str.contains(customer_search, case=False) |
-            customers_df['last_name'].str.contains(customer_search, case=False)
-        ]
+        filtered_customers = search_customers(customers_df, customer_search)
         if not filtered_customers.empty:
             selected_customer = st.sidebar.selectbox(
                 "Select Customer:",
@@ -108,7 +104,12 @@ def main():
         show_billing_revenue(customers_df, usage_history_df, selected_customer)
     elif page == "⚠️ Customer Risk & Retention":
         show_risk_retention(customers_df, usage_history_df, selected_customer)
+    elif page == "📈 Cohort Analysis":
+        show_cohort_analysis(customers_df, usage_history_df, selected_customer)
+    
+    profiler.render_panel([figure_cache.get_cache().summary()])
 
+@profiler.page
 def show_customer_overview(customers_df, usage_history_df, selected_customer):
     """Customer Overview page"""
     st.markdown('<h1 class="main-header">📋 Customer Overview Dashboard</h1>', unsafe_allow_html=True)
@@ -156,16 +157,17 @@ def show_customer_overview(customers_df, usage_history_df, selected_customer):
         # Usage overview
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("overview.current_usage", rows=1):
             st.subheader("📱 Current Usage (30 days)")
-            usage_data = {
-                'Metric': ['Voice Minutes', 'Data (GB)', 'SMS Count'],
-                'Usage': [customer['voice_minutes_30d'], customer['data_gb_30d'], customer['sms_count_30d']]
-            }
-            fig = px.bar(usage_data, x='Metric', y='Usage', 
-                        title="Usage Breakdown",
-                        color='Metric')
-            st.plotly_chart(fig, use_container_width=True)
+            def usage_breakdown():
+                usage_data = {
+                    'Metric': ['Voice Minutes', 'Data (GB)', 'SMS Count'],
+                    'Usage': [customer['voice_minutes_30d'], customer['data_gb_30d'], customer['sms_count_30d']]
+                }
+                return px.bar(usage_data, x='Metric', y='Usage', 
+                            title="Usage Breakdown",
+                            color='Metric')
+            show_chart("overview.current_usage", usage_breakdown, selected_customer)
         
         with col2:
             st.subheader("🛍️ Products & Recommendations")
@@ -179,30 +181,34 @@ def show_customer_overview(customers_df, usage_history_df, selected_customer):
                     st.write(f"💡 {product}")
         
         # Usage trends
-        customer_usage = usage_history_df[usage_history_df['customer_id'] == selected_customer].copy()
-        if not customer_usage.empty:
-            st.subheader("📈 Usage Trends (6 months)")
-            
-            customer_usage = customer_usage.sort_values('month')
-            
-            fig = make_subplots(
-                rows=2, cols=2,
-                subplot_titles=('Data Usage (GB)', 'Voice Minutes', 'SMS Count', 'Monthly Revenue'),
-                specs=[[{"secondary_y": False}, {"secondary_y": False}],
-                       [{"secondary_y": False}, {"secondary_y": False}]]
-            )
-            
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['data_gb'],
-                                   mode='lines+markers', name='Data GB'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['voice_minutes'],
-                                   mode='lines+markers', name='Voice Minutes'), row=1, col=2)
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['sms_count'],
-                                   mode='lines+markers', name='SMS Count'), row=2, col=1)
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['revenue'],
-                                   mode='lines+markers', name='Revenue'), row=2, col=2)
-            
-            fig.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+        with profiler.block("overview.usage_trends") as blk:
+            customer_usage = usage_history_df[usage_history_df['customer_id'] == selected_customer].copy()
+            blk.rows = len(usage_history_df)
+            if not customer_usage.empty:
+                st.subheader("📈 Usage Trends (6 months)")
+                
+                def usage_trends():
+                    trend = customer_usage.sort_values('month')
+                    
+                    fig = subplots.make_subplots(
+                        rows=2, cols=2,
+                        subplot_titles=('Data Usage (GB)', 'Voice Minutes', 'SMS Count', 'Monthly Revenue'),
+                        specs=[[{"secondary_y": False}, {"secondary_y": False}],
+                               [{"secondary_y": False}, {"secondary_y": False}]]
+                    )
+                    
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['data_gb'],
+                                           mode='lines+markers', name='Data GB'), row=1, col=1)
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['voice_minutes'],
+                                           mode='lines+markers', name='Voice Minutes'), row=1, col=2)
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['sms_count'],
+                                           mode='lines+markers', name='SMS Count'), row=2, col=1)
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['revenue'],
+                                           mode='lines+markers', name='Revenue'), row=2, col=2)
+                    
+                    fig.update_layout(height=500, showlegend=False)
+                    return fig
+                show_chart("overview.usage_trends", usage_trends, selected_customer)
     
     else:
         # Overview dashboard
@@ -223,38 +229,42 @@ def show_customer_overview(customers_df, usage_history_df, selected_customer):
         # Charts
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("overview.plan_distribution", rows=len(customers_df)):
             st.subheader("📊 Customer Distribution by Plan")
-            plan_counts = customers_df['plan_type'].value_counts()
-            fig = px.pie(values=plan_counts.values, names=plan_counts.index, 
-                        title="Customers by Plan Type")
-            st.plotly_chart(fig, use_container_width=True)
+            def plan_pie():
+                plan_counts = customers_df['plan_type'].value_counts()
+                return px.pie(values=plan_counts.values, names=plan_counts.index, 
+                            title="Customers by Plan Type")
+            show_chart("overview.plan_distribution", plan_pie)
         
-        with col2:
+        with col2, profiler.block("overview.satisfaction_distribution", rows=len(customers_df)):
             st.subheader("🎯 Customer Satisfaction Distribution")
-            fig = px.histogram(customers_df, x='satisfaction_score', nbins=20,
-                             title="Satisfaction Score Distribution")
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart("overview.satisfaction_distribution",
+                       lambda: px.histogram(customers_df, x='satisfaction_score', nbins=20,
+                                            title="Satisfaction Score Distribution"))
         
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("overview.churn_risk", rows=len(customers_df)):
             st.subheader("⚠️ Churn Risk Analysis")
-            risk_counts = customers_df['churn_risk'].value_counts()
-            colors = ['green', 'orange', 'red']
-            fig = px.bar(x=risk_counts.index, y=risk_counts.values,
-                        title="Customers by Churn Risk",
-                        color=risk_counts.index,
-                        color_discrete_sequence=colors)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
+            def churn_bar():
+                risk_counts = customers_df['churn_risk'].value_counts()
+                colors = ['green', 'orange', 'red']
+                return px.bar(x=risk_counts.index, y=risk_counts.values,
+                            title="Customers by Churn Risk",
+                            color=risk_counts.index,
+                            color_discrete_sequence=colors)
+            show_chart("overview.churn_risk", churn_bar)
+        
+        with col2, profiler.block("overview.revenue_by_plan", rows=len(customers_df)):
             st.subheader("💰 Revenue by Plan Type")
-            revenue_by_plan = customers_df.groupby('plan_type')['monthly_revenue'].agg(['mean', 'sum']).round(2)
-            fig = px.bar(x=revenue_by_plan.index, y=revenue_by_plan['sum'],
-                        title="Total Revenue by Plan Type")
-            st.plotly_chart(fig, use_container_width=True)
+            def revenue_bar():
+                revenue_by_plan = customers_df.groupby('plan_type')['monthly_revenue'].agg(['mean', 'sum']).round(2)
+                return px.bar(x=revenue_by_plan.index, y=revenue_by_plan['sum'],
+                            title="Total Revenue by Plan Type")
+            show_chart("overview.revenue_by_plan", revenue_bar)
 
+@profiler.page
 def show_usage_analytics(customers_df, usage_history_df, selected_customer):
     """Service Usage Analytics page"""
     st.markdown('<h1 class="main-header">📊 Service Usage Analytics</h1>', unsafe_allow_html=True)
@@ -273,69 +283,86 @@ def show_usage_analytics(customers_df, usage_history_df, selected_customer):
             st.metric("SMS Count (30d)", f"{customer['sms_count_30d']:,}")
         
         # Usage trends
-        customer_usage = usage_history_df[usage_history_df['customer_id'] == selected_customer].copy()
-        if not customer_usage.empty:
-            customer_usage = customer_usage.sort_values('month')
-            
-            # Combined usage chart
-            fig = make_subplots(
-                rows=3, cols=1,
-                subplot_titles=('Data Usage (GB)', 'Voice Minutes', 'SMS Count'),
-                vertical_spacing=0.1
-            )
-            
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['data_gb'],
-                                   mode='lines+markers', name='Data GB', line=dict(color='blue')), row=1, col=1)
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['voice_minutes'],
-                                   mode='lines+markers', name='Voice Minutes', line=dict(color='green')), row=2, col=1)
-            fig.add_trace(go.Scatter(x=customer_usage['month'], y=customer_usage['sms_count'],
-                                   mode='lines+markers', name='SMS Count', line=dict(color='orange')), row=3, col=1)
-            
-            fig.update_layout(height=600, showlegend=False, title_text="6-Month Usage Trends")
-            st.plotly_chart(fig, use_container_width=True)
+        with profiler.block("usage.trends", rows=len(usage_history_df)):
+            customer_usage = usage_history_df[usage_history_df['customer_id'] == selected_customer].copy()
+            if not customer_usage.empty:
+                # Combined usage chart
+                def usage_trends():
+                    trend = customer_usage.sort_values('month')
+                    fig = subplots.make_subplots(
+                        rows=3, cols=1,
+                        subplot_titles=('Data Usage (GB)', 'Voice Minutes', 'SMS Count'),
+                        vertical_spacing=0.1
+                    )
+                    
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['data_gb'],
+                                           mode='lines+markers', name='Data GB', line=dict(color='blue')), row=1, col=1)
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['voice_minutes'],
+                                           mode='lines+markers', name='Voice Minutes', line=dict(color='green')), row=2, col=1)
+                    fig.add_trace(go.Scatter(x=trend['month'], y=trend['sms_count'],
+                                           mode='lines+markers', name='SMS Count', line=dict(color='orange')), row=3, col=1)
+                    
+                    fig.update_layout(height=600, showlegend=False, title_text="6-Month Usage Trends")
+                    return fig
+                show_chart("usage.trends", usage_trends, selected_customer)
         
         # Usage patterns analysis
         st.subheader("📈 Usage Pattern Analysis")
         col1, col2 = st.columns(2)
         
-        with col1:
+        plan = customer['plan_type']
+        plan_baselines = baselines.get_baselines(customers_df, data_version())
+        pct = plan_baselines.percentiles(customer)
+        
+        with col1, profiler.block("usage.plan_comparison", rows=len(customers_df)):
             # Compare to plan average
-            plan_avg = customers_df[customers_df['plan_type'] == customer['plan_type']].agg({
-                'voice_minutes_30d': 'mean',
-                'data_gb_30d': 'mean',
-                'sms_count_30d': 'mean'
-            })
-            
-            comparison_data = {
-                'Metric': ['Voice Minutes', 'Data (GB)', 'SMS Count'],
-                'Customer': [customer['voice_minutes_30d'], customer['data_gb_30d'], customer['sms_count_30d']],
-                'Plan Average': [plan_avg['voice_minutes_30d'], plan_avg['data_gb_30d'], plan_avg['sms_count_30d']]
-            }
-            
-            fig = px.bar(comparison_data, x='Metric', y=['Customer', 'Plan Average'],
-                        title=f"Usage vs {customer['plan_type']} Plan Average",
-                        barmode='group')
-            st.plotly_chart(fig, use_container_width=True)
+            def plan_comparison():
+                comparison_data = {
+                    'Metric': ['Voice Minutes', 'Data (GB)', 'SMS Count'],
+                    'Customer': [customer['voice_minutes_30d'], customer['data_gb_30d'], customer['sms_count_30d']],
+                    'Plan Average': [plan_baselines.mean(plan, 'voice_minutes_30d'),
+                                     plan_baselines.mean(plan, 'data_gb_30d'),
+                                     plan_baselines.mean(plan, 'sms_count_30d')]
+                }
+                
+                return px.bar(comparison_data, x='Metric', y=['Customer', 'Plan Average'],
+                            title=f"Usage vs {plan} Plan Average",
+                            barmode='group')
+            show_chart("usage.plan_comparison", plan_comparison, selected_customer)
+            st.caption(
+                f"Within {plan}: voice {baselines.ordinal(pct['voice_minutes_30d'])}, "
+                f"data {baselines.ordinal(pct['data_gb_30d'])}, "
+                f"SMS {baselines.ordinal(pct['sms_count_30d'])} percentile"
+            )
         
         with col2:
             # Usage recommendations
             st.markdown("#### 💡 Usage Insights & Recommendations")
             
             # High data usage
-            if customer['data_gb_30d'] > plan_avg['data_gb_30d'] * 1.5:
-                st.success("📱 High data user - Consider unlimited data plan")
+            if pct['data_gb_30d'] >= 90:
+                st.success(f"📱 High data user ({baselines.ordinal(pct['data_gb_30d'])} percentile of {plan}) - Consider unlimited data plan")
             
             # Low usage
-            if customer['data_gb_30d'] < plan_avg['data_gb_30d'] * 0.5:
-                st.info("📉 Low data usage - Could downgrade to save money")
+            if pct['data_gb_30d'] <= 10:
+                st.info(f"📉 Low data usage ({baselines.ordinal(pct['data_gb_30d'])} percentile of {plan}) - Could downgrade to save money")
             
             # High voice usage
-            if customer['voice_minutes_30d'] > plan_avg['voice_minutes_30d'] * 1.3:
-                st.warning("📞 Heavy voice user - Check voice plan limits")
+            if pct['voice_minutes_30d'] >= 85:
+                st.warning(f"📞 Heavy voice user ({baselines.ordinal(pct['voice_minutes_30d'])} percentile of {plan}) - Check voice plan limits")
             
             # SMS usage
             if customer['sms_count_30d'] > 100:
                 st.info("💬 Active SMS user - Consider messaging apps")
+        
+        # Anomalies in this customer's history
+        with profiler.block("usage.customer_anomalies", rows=len(usage_history_df)):
+            usage_anomalies = anomalies.get_anomalies(usage_history_df, data_version())
+            customer_anomalies = usage_anomalies[usage_anomalies['customer_id'] == selected_customer]
+            if not customer_anomalies.empty:
+                st.subheader("🚨 Usage Anomalies")
+                st.dataframe(customer_anomalies.drop(columns=['customer_id', 'severity']),
+                             use_container_width=True, hide_index=True)
     
     else:
         # Overall usage analytics
@@ -353,42 +380,61 @@ def show_usage_analytics(customers_df, usage_history_df, selected_customer):
         # Usage distribution charts
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("usage.data_distribution", rows=len(customers_df)):
             st.subheader("📊 Data Usage Distribution")
-            fig = px.histogram(customers_df, x='data_gb_30d', nbins=30,
-                             title="Data Usage Distribution (GB)")
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart("usage.data_distribution",
+                       lambda: px.histogram(customers_df, x='data_gb_30d', nbins=30,
+                                            title="Data Usage Distribution (GB)"))
         
-        with col2:
+        with col2, profiler.block("usage.voice_distribution", rows=len(customers_df)):
             st.subheader("📞 Voice Usage Distribution")
-            fig = px.histogram(customers_df, x='voice_minutes_30d', nbins=30,
-                             title="Voice Minutes Distribution")
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart("usage.voice_distribution",
+                       lambda: px.histogram(customers_df, x='voice_minutes_30d', nbins=30,
+                                            title="Voice Minutes Distribution"))
         
         # Usage by plan type
-        st.subheader("📋 Usage Patterns by Plan Type")
-        
-        plan_usage = customers_df.groupby('plan_type').agg({
-            'voice_minutes_30d': 'mean',
-            'data_gb_30d': 'mean',
-            'sms_count_30d': 'mean'
-        }).round(2)
-        
-        fig = make_subplots(
-            rows=1, cols=3,
-            subplot_titles=('Average Voice Minutes', 'Average Data (GB)', 'Average SMS Count'),
-        )
-        
-        fig.add_trace(go.Bar(x=plan_usage.index, y=plan_usage['voice_minutes_30d'],
-                           name='Voice Minutes'), row=1, col=1)
-        fig.add_trace(go.Bar(x=plan_usage.index, y=plan_usage['data_gb_30d'],
-                           name='Data GB'), row=1, col=2)
-        fig.add_trace(go.Bar(x=plan_usage.index, y=plan_usage['sms_count_30d'],
-                           name='SMS Count'), row=1, col=3)
-        
-        fig.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig, use_container_width=True)
+        with profiler.block("usage.by_plan", rows=len(customers_df)):
+            st.subheader("📋 Usage Patterns by Plan Type")
+        
+            def plan_usage_bars():
+                plan_usage = customers_df.groupby('plan_type').agg({
+                    'voice_minutes_30d': 'mean',
+                    'data_gb_30d': 'mean',
+                    'sms_count_30d': 'mean'
+                }).round(2)
+                
+                fig = subplots.make_subplots(
+                    rows=1, cols=3,
+                    subplot_titles=('Average Voice Minutes', 'Average Data (GB)', 'Average SMS Count'),
+                )
+                
+                fig.add_trace(go.Bar(x=plan_usage.index, y=plan_usage['voice_minutes_30d'],
+                                   name='Voice Minutes'), row=1, col=1)
+                fig.add_trace(go.Bar(x=plan_usage.index, y=plan_usage['data_gb_30d'],
+                                   name='Data GB'), row=1, col=2)
+                fig.add_trace(go.Bar(x=plan_usage.index, y=plan_usage['sms_count_30d'],
+                                   name='SMS Count'), row=1, col=3)
+                
+                fig.update_layout(height=400, showlegend=False)
+                return fig
+            show_chart("usage.by_plan", plan_usage_bars)
+        
+        # Top anomalies across all customers
+        with profiler.block("usage.anomalies", rows=len(usage_history_df)):
+            st.subheader("🚨 Usage Anomalies")
+            usage_anomalies = anomalies.get_anomalies(usage_history_df, data_version())
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                metrics = st.multiselect("Metrics", anomalies.METRICS, default=anomalies.METRICS, key="anomaly_metrics")
+            with col2:
+                top_n = st.number_input("Show top", min_value=5, max_value=500, value=20, step=5, key="anomaly_top_n")
+            shown = usage_anomalies[usage_anomalies['metric'].isin(metrics)].head(top_n)
+            st.caption(f"{len(usage_anomalies):,} flagged customer-months: |z| ≥ {anomalies.critical_value():.1f} against the "
+                       f"previous {anomalies.WINDOW} months (as rare on noise as a normal |z| ≥ {anomalies.Z_THRESHOLD:g}), "
+                       f"or a month-over-month change of ≥ {anomalies.MOM_THRESHOLD:.0%}")
+            st.dataframe(shown.drop(columns=['severity']), use_container_width=True, hide_index=True)
 
+@profiler.page
 def show_billing_revenue(customers_df, usage_history_df, selected_customer):
     """Billing & Revenue page"""
     st.markdown('<h1 class="main-header">💰 Billing & Revenue Analysis</h1>', unsafe_allow_html=True)
@@ -399,8 +445,11 @@ def show_billing_revenue(customers_df, usage_history_df, selected_customer):
         
         # Billing metrics
         col1, col2, col3, col4 = st.columns(4)
+        revenue_pct = baselines.get_baselines(customers_df, data_version()).percentile(
+            customer['plan_type'], 'monthly_revenue', customer['monthly_revenue'])
         with col1:
-            st.metric("Monthly Revenue", f"${customer['monthly_revenue']:.2f}")
+            st.metric("Monthly Revenue", f"${customer['monthly_revenue']:.2f}",
+                      help=f"{baselines.ordinal(revenue_pct)} percentile of {customer['plan_type']} customers")
         with col2:
             st.metric("Payment Method", customer['payment_method'])
         with col3:
@@ -421,25 +470,28 @@ def show_billing_revenue(customers_df, usage_history_df, selected_customer):
             st.success("✅ Account is current with no overdue amounts")
         
         # Revenue trends
-        customer_usage = usage_history_df[usage_history_df['customer_id'] == selected_customer].copy()
-        if not customer_usage.empty:
-            customer_usage = customer_usage.sort_values('month')
+        with profiler.block("billing.revenue_trend", rows=len(usage_history_df)):
+            customer_usage = usage_history_df[usage_history_df['customer_id'] == selected_customer].copy()
+            if not customer_usage.empty:
+                customer_usage = customer_usage.sort_values('month')
             
-            fig = px.line(customer_usage, x='month', y='revenue',
-                         title="6-Month Revenue Trend",
-                         markers=True)
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+                def revenue_trend():
+                    fig = px.line(customer_usage, x='month', y='revenue',
+                                 title="6-Month Revenue Trend",
+                                 markers=True)
+                    fig.update_layout(height=400)
+                    return fig
+                show_chart("billing.revenue_trend", revenue_trend, selected_customer)
             
-            # Revenue statistics
-            total_revenue_6m = customer_usage['revenue'].sum()
-            avg_monthly = customer_usage['revenue'].mean()
+                # Revenue statistics
+                total_revenue_6m = customer_usage['revenue'].sum()
+                avg_monthly = customer_usage['revenue'].mean()
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("6-Month Total Revenue", f"${total_revenue_6m:.2f}")
-            with col2:
-                st.metric("Average Monthly", f"${avg_monthly:.2f}")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("6-Month Total Revenue", f"${total_revenue_6m:.2f}")
+                with col2:
+                    st.metric("Average Monthly", f"${avg_monthly:.2f}")
     
     else:
         # Overall revenue analytics
@@ -461,39 +513,42 @@ def show_billing_revenue(customers_df, usage_history_df, selected_customer):
         # Revenue charts
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("billing.revenue_by_plan", rows=len(customers_df)):
             st.subheader("💰 Revenue by Plan Type")
-            revenue_by_plan = customers_df.groupby('plan_type')['monthly_revenue'].sum().round(2)
-            fig = px.pie(values=revenue_by_plan.values, names=revenue_by_plan.index,
-                        title="Revenue Distribution by Plan")
-            st.plotly_chart(fig, use_container_width=True)
+            def revenue_pie():
+                revenue_by_plan = customers_df.groupby('plan_type')['monthly_revenue'].sum().round(2)
+                return px.pie(values=revenue_by_plan.values, names=revenue_by_plan.index,
+                            title="Revenue Distribution by Plan")
+            show_chart("billing.revenue_by_plan", revenue_pie)
         
-        with col2:
+        with col2, profiler.block("billing.revenue_distribution", rows=len(customers_df)):
             st.subheader("📊 Revenue Distribution")
-            fig = px.histogram(customers_df, x='monthly_revenue', nbins=30,
-                             title="Monthly Revenue Distribution")
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart("billing.revenue_distribution",
+                       lambda: px.histogram(customers_df, x='monthly_revenue', nbins=30,
+                                            title="Monthly Revenue Distribution"))
         
         # Payment methods
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("billing.payment_methods", rows=len(customers_df)):
             st.subheader("💳 Payment Methods")
-            payment_counts = customers_df['payment_method'].value_counts()
-            fig = px.bar(x=payment_counts.index, y=payment_counts.values,
-                        title="Payment Method Distribution")
-            st.plotly_chart(fig, use_container_width=True)
+            def payment_bar():
+                payment_counts = customers_df['payment_method'].value_counts()
+                return px.bar(x=payment_counts.index, y=payment_counts.values,
+                            title="Payment Method Distribution")
+            show_chart("billing.payment_methods", payment_bar)
         
-        with col2:
+        with col2, profiler.block("billing.overdue", rows=len(customers_df)):
             st.subheader("⚠️ Overdue Analysis")
             overdue_data = customers_df[customers_df['overdue_amount'] > 0]
             if not overdue_data.empty:
-                fig = px.histogram(overdue_data, x='overdue_amount', nbins=20,
-                                 title="Overdue Amount Distribution")
-                st.plotly_chart(fig, use_container_width=True)
+                show_chart("billing.overdue",
+                           lambda: px.histogram(overdue_data, x='overdue_amount', nbins=20,
+                                                title="Overdue Amount Distribution"))
             else:
                 st.success("No customers with overdue amounts!")
 
+@profiler.page
 def show_risk_retention(customers_df, usage_history_df, selected_customer):
     """Customer Risk & Retention page"""
     st.markdown('<h1 class="main-header">⚠️ Customer Risk & Retention</h1>', unsafe_allow_html=True)
@@ -560,21 +615,23 @@ def show_risk_retention(customers_df, usage_history_df, selected_customer):
             st.write("• Regular satisfaction surveys")
         
         # Customer journey timeline
-        st.subheader("🛤️ Customer Journey")
-        journey_data = {
-            'Date': [customer['last_payment_date'], customer['last_support_date']],
-            'Event': ['Last Payment', 'Last Support Contact'],
-            'Days Ago': [
-                (datetime.now().date() - customer['last_payment_date'].date()).days,
-                (datetime.now().date() - customer['last_support_date'].date()).days if pd.notna(customer['last_support_date']) else None
-            ]
-        }
-        
-        journey_df = pd.DataFrame(journey_data).dropna()
-        if not journey_df.empty:
-            fig = px.timeline(journey_df, x_start='Date', x_end='Date', y='Event',
-                             title="Recent Customer Activity")
-            st.plotly_chart(fig, use_container_width=True)
+        with profiler.block("risk.journey", rows=1):
+            st.subheader("🛤️ Customer Journey")
+            journey_data = {
+                'Date': [customer['last_payment_date'], customer['last_support_date']],
+                'Event': ['Last Payment', 'Last Support Contact'],
+                'Days Ago': [
+                    (datetime.now().date() - customer['last_payment_date'].date()).days,
+                    (datetime.now().date() - customer['last_support_date'].date()).days if pd.notna(customer['last_support_date']) else None
+                ]
+            }
+        
+            journey_df = pd.DataFrame(journey_data).dropna()
+            if not journey_df.empty:
+                show_chart("risk.journey",
+                           lambda: px.timeline(journey_df, x_start='Date', x_end='Date', y='Event',
+                                               title="Recent Customer Activity"),
+                           selected_customer)
     
     else:
         # Overall risk analysis
@@ -594,50 +651,105 @@ def show_risk_retention(customers_df, usage_history_df, selected_customer):
         # Risk analysis charts
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.block("risk.distribution", rows=len(customers_df)):
             st.subheader("⚠️ Churn Risk Distribution")
             colors = ['green', 'orange', 'red']
-            fig = px.pie(values=risk_counts.values, names=risk_counts.index,
-                        title="Customer Risk Levels",
-                        color_discrete_sequence=colors)
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart("risk.distribution",
+                       lambda: px.pie(values=risk_counts.values, names=risk_counts.index,
+                                      title="Customer Risk Levels",
+                                      color_discrete_sequence=colors))
         
-        with col2:
+        with col2, profiler.block("risk.satisfaction", rows=len(customers_df)):
             st.subheader("😊 Satisfaction vs Risk")
-            fig = px.box(customers_df, x='churn_risk', y='satisfaction_score',
-                        title="Satisfaction Score by Risk Level",
-                        color='churn_risk',
-                        color_discrete_sequence=['green', 'orange', 'red'])
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart("risk.satisfaction",
+                       lambda: px.box(customers_df, x='churn_risk', y='satisfaction_score',
+                                      title="Satisfaction Score by Risk Level",
+                                      color='churn_risk',
+                                      color_discrete_sequence=['green', 'orange', 'red']))
         
         # High risk customers table
-        st.subheader("🚨 High Risk Customers Requiring Attention")
-        high_risk_customers = customers_df[customers_df['churn_risk'] == 'High'].copy()
-        
-        if not high_risk_customers.empty:
-            # Select relevant columns for display
-            display_cols = ['customer_id', 'first_name', 'last_name', 'plan_type', 
-                          'monthly_revenue', 'satisfaction_score', 'support_tickets_6m', 'overdue_amount']
+        with profiler.block("risk.high_risk_table", rows=len(customers_df)):
+            st.subheader("🚨 High Risk Customers Requiring Attention")
+            high_risk = worklist.get_worklist(customers_df, data_version())
             
-            high_risk_display = high_risk_customers[display_cols].sort_values('monthly_revenue', ascending=False)
-            st.dataframe(high_risk_display, use_container_width=True)
-        else:
-            st.success("🎉 No high-risk customers identified!")
+            if len(high_risk):
+                worklist.render(high_risk)
+            else:
+                st.success("🎉 No high-risk customers identified!")
         
         # Correlation analysis
-        st.subheader("📊 Risk Factor Correlations")
-        
-        # Create risk score for correlation
-        risk_mapping = {'Low': 1, 'Medium': 2, 'High': 3}
-        customers_df['risk_score'] = customers_df['churn_risk'].map(risk_mapping)
-        
-        correlation_data = customers_df[['risk_score', 'satisfaction_score', 'support_tickets_6m', 
-                                       'tenure_months', 'overdue_amount']].corr()
+        with profiler.block("risk.correlation", rows=len(customers_df)):
+            st.subheader("📊 Risk Factor Correlations")
+        
+            def correlation_heatmap():
+                # Create risk score for correlation
+                risk_mapping = {'Low': 1, 'Medium': 2, 'High': 3}
+                risk_scored = customers_df.assign(risk_score=customers_df['churn_risk'].map(risk_mapping))
+                
+                correlation_data = risk_scored[['risk_score', 'satisfaction_score', 'support_tickets_6m', 
+                                                'tenure_months', 'overdue_amount']].corr()
+                
+                return px.imshow(correlation_data, 
+                               title="Risk Factor Correlation Matrix",
+                               color_continuous_scale='RdBu_r')
+            show_chart("risk.correlation", correlation_heatmap)
+
+@profiler.page
+def show_cohort_analysis(customers_df, usage_history_df, selected_customer):
+    """Cohort Analysis page"""
+    st.markdown('<h1 class="main-header">📈 Cohort Analysis</h1>', unsafe_allow_html=True)
+    matrix = cohorts.get_cohorts(customers_df, usage_history_df, data_version())
+    months = matrix.month_labels()
+    
+    if selected_customer and selected_customer != '':
+        customer = customers_df[customers_df['customer_id'] == selected_customer].iloc[0]
+        cohort = matrix.cohort_of(selected_customer)
+        latest_revenue = usage_history_df[(usage_history_df['customer_id'] == selected_customer) &
+                                          (usage_history_df['month'] == months[-1])]['revenue'].sum()
+        cohort_revenue = matrix.values('Revenue per active customer')[cohort, -1]
         
-        fig = px.imshow(correlation_data, 
-                       title="Risk Factor Correlation Matrix",
-                       color_continuous_scale='RdBu_r')
-        st.plotly_chart(fig, use_container_width=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Cohort", cohorts.COHORTS[cohort], help=f"Tenure of {customer['tenure_months']} months")
+        with col2:
+            st.metric("Cohort Size", f"{matrix.sizes[cohort]:,}")
+        with col3:
+            st.metric(f"Revenue in {months[-1]}", f"${latest_revenue:.2f}",
+                      delta=f"{latest_revenue - cohort_revenue:+.2f} vs cohort average")
+    
+    # Cohort x month heatmap
+    with profiler.block("cohort.heatmap", rows=len(usage_history_df)):
+        st.subheader("🗓️ Cohorts by Month")
+        view = st.selectbox("Show", list(cohorts.VIEWS), key="cohort_view")
+        table = matrix.table(view)
+        
+        def cohort_heatmap():
+            fig = px.imshow(table, text_auto='.1f', aspect='auto',
+                            labels={'x': 'Month', 'y': 'Tenure Cohort', 'color': view},
+                            color_continuous_scale='Blues')
+            fig.update_layout(height=400)
+            return fig
+        show_chart(f"cohort.heatmap.{view}", cohort_heatmap)
+        st.caption(f"Customers are grouped by tenure in {months[-1]}; usage from before a customer joined is left out.")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1, profiler.block("cohort.arpu", rows=len(cohorts.COHORTS)):
+        st.subheader("💰 Revenue per Active Customer")
+        
+        def arpu_lines():
+            arpu = matrix.table('Revenue per active customer').reset_index().melt(
+                id_vars='cohort', var_name='month', value_name='revenue')
+            return px.line(arpu, x='month', y='revenue', color='cohort', markers=True,
+                           title="Monthly Revenue per Active Customer by Cohort")
+        show_chart("cohort.arpu", arpu_lines)
+    
+    with col2, profiler.block("cohort.sizes", rows=len(cohorts.COHORTS)):
+        st.subheader("👥 Cohort Sizes")
+        show_chart("cohort.sizes",
+                   lambda: px.bar(x=cohorts.COHORTS, y=matrix.sizes, title="Customers per Tenure Cohort",
+                                  labels={'x': 'Tenure Cohort', 'y': 'Customers'}))
 
 if __name__ == "__main__":
-    main()
+    with profiler.rerun():
+        main()
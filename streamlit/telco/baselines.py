@@ -0,0 +1,47 @@
+"""Per-plan percentile baselines for customer-vs-cohort comparisons.
+
+For every plan the usage and revenue metrics are kept as sorted arrays, so
+where a customer sits within their plan is two ``searchsorted`` calls instead
+of a filter and aggregate over the whole customer table. The index is built
+once per data version and shared by every session.
+"""
+import numpy as np
+import streamlit as st
+
+METRICS = ["voice_minutes_30d", "data_gb_30d", "sms_count_30d", "monthly_revenue"]
+
+
+class PlanBaselines:
+    def __init__(self, customers_df, metrics=METRICS):
+        self.metrics = list(metrics)
+        self.sorted = {}
+        self.means = {}
+        for plan, group in customers_df.groupby("plan_type", sort=False):
+            self.sorted[plan] = {m: np.sort(group[m].to_numpy(dtype=float)) for m in self.metrics}
+            self.means[plan] = {m: float(values.mean()) for m, values in self.sorted[plan].items()}
+
+    def percentile(self, plan, metric, value):
+        """Percentile rank (0-100) of ``value`` within ``plan``; ties count half."""
+        values = self.sorted[plan][metric]
+        below = np.searchsorted(values, value, side="left")
+        at_or_below = np.searchsorted(values, value, side="right")
+        return 100.0 * (below + at_or_below) / (2 * len(values))
+
+    def percentiles(self, customer):
+        """Percentile of each metric for one customer row, within their plan."""
+        return {m: self.percentile(customer["plan_type"], m, customer[m]) for m in self.metrics}
+
+    def mean(self, plan, metric):
+        return self.means[plan][metric]
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_baselines(_customers_df, version):
+    """Shared index for one data version; ``version`` is the cache key."""
+    return PlanBaselines(_customers_df)
+
+
+def ordinal(pct):
+    n = int(round(pct))
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
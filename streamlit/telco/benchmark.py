@@ -0,0 +1,449 @@
+"""Reproducible benchmarks for the telco dashboard and data generator.
+
+Times the data generator at several scale factors, ``load_data`` cold and
+warm, the sidebar customer search, the per-plan percentile index, the
+anomaly scan and the cohort matrices (on the sample data and on 10M
+synthetic customer-months, plus the anomaly flag rate on that noise), the
+event-level CDR generator, every ``show_*`` page with and without a
+selected customer (driven headlessly through Streamlit's AppTest), and cold start: app import time and the time
+from process start to the first page served over a real websocket session
+(needs the ``websockets`` package).
+Each case records the median wall time over ``--repeat`` runs and the peak
+traced memory of one extra run; the cold-start cases, which run in a
+subprocess, record that process's peak resident memory instead. Results are
+written as JSON and compared against a stored baseline. Without a baseline
+for every case that ran, the run fails and says how to store one.
+
+    python benchmark.py                      # run and compare with the baseline
+    python benchmark.py --save-baseline      # store this run as the new baseline
+    python benchmark.py --only page --repeat 3
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "benchmark_baseline.json")
+PAGES = ["🏠 Customer Overview", "📊 Service Usage Analytics", "💰 Billing & Revenue", "⚠️ Customer Risk & Retention",
+         "📈 Cohort Analysis"]
+SAMPLE_CUSTOMER = "CUST_000002"
+
+
+def measure(fn, repeat):
+    """Median wall time of ``fn`` over ``repeat`` runs, plus peak memory of one more.
+
+    A case that returns a number reports that many seconds instead of its wall
+    time. One that returns ``(seconds, peak MB)`` ran in a subprocess: its peak
+    is reported as ``peak_rss_mb``, since this process's traced memory says
+    nothing about it.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        elapsed = fn()
+        if isinstance(elapsed, tuple):
+            elapsed = elapsed[0]
+        timings.append(elapsed if isinstance(elapsed, float) else time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    last = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "median_s": round(statistics.median(timings), 6),
+        "min_s": round(min(timings), 6),
+    }
+    if isinstance(last, tuple):
+        result["peak_rss_mb"] = round(last[1], 3)
+    else:
+        result["peak_mb"] = round(peak / 1e6, 3)
+    return result
+
+
+def generator_cases(scales):
+    from data_generator import generate_telco_data, generate_usage_history
+
+    cases = {}
+    for n in scales:
+        customers = generate_telco_data(n)
+        cases[f"generate_telco_data[{n}]"] = lambda n=n: generate_telco_data(n)
+        cases[f"generate_usage_history[{n}]"] = lambda customers=customers: generate_usage_history(customers, 6)
+    return cases
+
+
+def load_cases():
+    import app
+
+    version = app.data_version()
+
+    def cold():
+        app.load_data.clear()
+        app.load_data(version)
+
+    app.load_data(version)
+    return {"load_data[cold]": cold, "load_data[warm]": lambda: app.load_data(version)}
+
+
+def search_cases():
+    import app
+
+    customers, _ = app.load_data(app.data_version())
+    return {
+        f"search_customers[{query}]": lambda query=query: app.search_customers(customers, query)
+        for query in ("CUST_0001", "john", "zz-no-match")
+    }
+
+
+def baseline_cases():
+    import app
+    from baselines import PlanBaselines
+
+    customers, _ = app.load_data(app.data_version())
+    index = PlanBaselines(customers)
+    customer = customers.iloc[0]
+    return {
+        "plan_baselines[build]": lambda: PlanBaselines(customers),
+        "plan_baselines[percentiles]": lambda: index.percentiles(customer),
+    }
+
+
+def synthetic_usage(rows, months=12, seed=0):
+    """A usage_history-shaped frame with ``rows`` customer-months, built without Faker."""
+    import numpy as np
+    import pandas as pd
+    from anomalies import METRICS
+
+    rng = np.random.default_rng(seed)
+    customers = rows // months
+    frame = pd.DataFrame({
+        "customer_id": pd.Categorical.from_codes(
+            np.repeat(np.arange(customers), months), [f"CUST_{i:08d}" for i in range(customers)]
+        ),
+        "month": pd.Categorical.from_codes(
+            np.tile(np.arange(months), customers), [f"2024-{m:02d}" for m in range(1, months + 1)]
+        ),
+    })
+    level = rng.lognormal(3, 1, customers).repeat(months)
+    for metric in METRICS:
+        frame[metric] = level * rng.normal(1, 0.2, customers * months)
+    return frame
+
+
+def anomaly_cases(rows):
+    from anomalies import detect
+    import app
+
+    _, usage = app.load_data(app.data_version())
+    synthetic = synthetic_usage(rows)
+    return {
+        f"detect_anomalies[{len(usage)}]": lambda: detect(usage),
+        f"detect_anomalies[{rows}]": lambda: detect(synthetic),
+    }
+
+
+def noise_flag_rate(rows):
+    """Share of scored cells flagged on ``synthetic_usage``, which is pure noise around each customer's level.
+
+    The z rule must come out within ``NOISE_RATE_TOLERANCE`` of the normal rate for |z| >= Z_THRESHOLD.
+    """
+    from statistics import NormalDist
+
+    import numpy as np
+    from anomalies import (METRICS, MOM_THRESHOLD, NOISE_RATE_TOLERANCE, WINDOW, Z_THRESHOLD, critical_value,
+                           score, to_matrix)
+
+    matrices, _, _, present = to_matrix(synthetic_usage(rows))
+    z_cutoff = critical_value(WINDOW, Z_THRESHOLD)
+    z_flags = mom_flags = scored = 0
+    for metric in METRICS:
+        z, _, mom = score(matrices[metric], present)
+        eligible = ~np.isnan(z)
+        scored += eligible.sum()
+        with np.errstate(invalid='ignore'):
+            z_flags += (np.abs(z[eligible]) >= z_cutoff).sum()
+            mom_flags += (np.abs(mom[eligible]) >= MOM_THRESHOLD).sum()
+    z_rate, target = float(z_flags / scored), 2 * NormalDist().cdf(-Z_THRESHOLD)
+    if abs(z_rate - target) > NOISE_RATE_TOLERANCE * target:
+        raise AssertionError(f"anomalies: z flag rate on noise is {z_rate:.5f}, target {target:.5f}")
+    return {
+        "cells": int(scored),
+        "z_rate": round(z_rate, 6),
+        "normal_z_rate": round(target, 6),
+        "mom_rate": round(float(mom_flags / scored), 6),
+    }
+
+
+def cohort_cases(rows, months=12):
+    """Cohort matrices: a full build, appending the last month, and a pandas groupby for comparison.
+
+    Appending the last month must give the same matrices as the full build.
+    """
+    import numpy as np
+    import pandas as pd
+    from cohorts import METRICS, TENURE_BANDS, CohortMatrix
+
+    synthetic = synthetic_usage(rows, months)
+    ids = synthetic["customer_id"].cat.categories
+    last = synthetic["month"].cat.categories[-1]
+    customers = pd.DataFrame({
+        "customer_id": ids,
+        "tenure_months": np.random.default_rng(1).integers(1, 120, len(ids)),
+        "last_payment_date": f"{last}-01",
+    })
+    is_last = (synthetic["month"] == last).to_numpy()
+    head, tail = synthetic[~is_last], synthetic[is_last]
+    previous = CohortMatrix(customers, head)
+    if not previous.append_month(tail).equals(CohortMatrix(customers, synthetic)):
+        raise AssertionError("cohorts: appending the last month differs from a full build")
+
+    def groupby():
+        merged = synthetic.merge(customers, on="customer_id")
+        merged["cohort"] = np.searchsorted(TENURE_BANDS, merged["tenure_months"], side="right") - 1
+        grouped = merged.groupby(["cohort", "month"], observed=True)
+        return grouped[METRICS].sum().join(grouped["customer_id"].nunique())
+
+    return {
+        f"cohorts[build,{len(synthetic)}]": lambda: CohortMatrix(customers, synthetic),
+        f"cohorts[append_month,{len(synthetic)}]": lambda: previous.append_month(tail),
+        f"cohorts[pandas_groupby,{len(synthetic)}]": groupby,
+    }
+
+
+def cdr_cases(replicate, days=1):
+    """One worker writing ``days`` of events for ``replicate`` copies of the customer file."""
+    import shutil
+    import tempfile
+
+    from cdr_generator import generate
+
+    def run(fmt):
+        out = tempfile.mkdtemp(prefix="cdr-bench-")
+        try:
+            generate({
+                "customers": os.path.join(HERE, "customer_data.csv"), "out": out, "socket": None,
+                "format": fmt, "start_ms": 1_700_000_000_000, "days": days, "replicate": replicate,
+                "workers": 1, "rate": 0, "batch_events": 200_000, "max_file_bytes": 256 * 2**20, "seed": 42,
+            })
+        finally:
+            shutil.rmtree(out)
+
+    return {f"cdr_generate[{fmt},x{replicate},{days}d]": lambda fmt=fmt: run(fmt) for fmt in ("npy", "csv")}
+
+
+def page_cases():
+    from streamlit.testing.v1 import AppTest
+
+    cases = {}
+    for customer in ("", SAMPLE_CUSTOMER):
+        for page in PAGES:
+            at = AppTest.from_file(os.path.join(HERE, "app.py"), default_timeout=120)
+            at.run()
+            at.selectbox[0].select(page)
+            if customer:
+                at.selectbox[1].select(customer)
+            at.run()
+            if at.exception:
+                raise RuntimeError(f"{page} ({customer or 'overview'}) failed: {at.exception[0].value}")
+            mode = "customer" if customer else "overview"
+            cases[f"page[{page.split(' ', 1)[1]}|{mode}]"] = at.run
+    return cases
+
+
+def _free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _first_render(port, timeout=120):
+    """Open one browser-like session and wait until its first script run finishes."""
+    import asyncio
+
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    async def session():
+        async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                      max_size=None) as ws:
+            msg = BackMsg()
+            msg.rerun_script.query_string = ""
+            await ws.send(msg.SerializeToString())
+            while True:
+                forward = ForwardMsg()
+                forward.ParseFromString(await ws.recv())
+                if forward.WhichOneof("type") == "script_finished":
+                    return
+
+    asyncio.run(asyncio.wait_for(session(), timeout))
+
+
+def _reap(proc):
+    """Wait for ``proc``; its peak resident memory in MB."""
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux.
+    return usage.ru_maxrss / 1e3
+
+
+def _import_app():
+    """Seconds to import app.py in a fresh interpreter, and that interpreter's peak memory."""
+    import subprocess
+
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", "import app"], cwd=HERE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    peak = _reap(proc)
+    if proc.returncode:
+        raise RuntimeError(f"import app exited with {proc.returncode}")
+    return time.perf_counter() - started, peak
+
+
+def _startup(command, phase):
+    """Start a server process; (seconds until ready or from ready to its first page, its peak MB)."""
+    import subprocess
+    from serve import check
+
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [*command, "--server.headless", "true", "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not check(f"http://127.0.0.1:{port}", timeout=0.5):
+            if proc.poll() is not None:
+                raise RuntimeError(f"{' '.join(command)} exited with {proc.returncode}")
+            time.sleep(0.05)
+        ready = time.perf_counter()
+        if phase == "ready":
+            seconds = ready - started
+        else:
+            _first_render(port)
+            seconds = time.perf_counter() - ready
+    finally:
+        if proc.returncode is None:
+            proc.terminate()
+        peak = _reap(proc) if proc.returncode is None else 0.0
+    return seconds, peak
+
+
+def startup_cases():
+    """Cold-process costs: importing the app, server readiness, and the first page after it."""
+    commands = {
+        "streamlit run": [sys.executable, "-m", "streamlit", "run", "app.py"],
+        "serve.py": [sys.executable, "serve.py"],
+    }
+    cases = {"import[app]": _import_app}
+    for name, command in commands.items():
+        for phase in ("ready", "first_render"):
+            cases[f"{phase}[{name}]"] = lambda command=command, phase=phase: _startup(command, phase)
+    return cases
+
+
+GROUPS = {
+    "generator": lambda args: generator_cases(args.scales),
+    "load": lambda args: load_cases(),
+    "search": lambda args: search_cases(),
+    "baseline": lambda args: baseline_cases(),
+    "anomaly": lambda args: anomaly_cases(args.anomaly_rows),
+    "cohort": lambda args: cohort_cases(args.anomaly_rows),
+    "cdr": lambda args: cdr_cases(args.cdr_replicate),
+    "page": lambda args: page_cases(),
+    "startup": lambda args: startup_cases(),
+}
+
+
+def compare(results, baseline, threshold):
+    """Cases whose time or memory grew by more than ``threshold`` (a fraction)."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ("median_s", "peak_mb", "peak_rss_mb"):
+            if previous.get(metric) and metric in current and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(
+                    {
+                        "case": name,
+                        "metric": metric,
+                        "baseline": previous[metric],
+                        "current": current[metric],
+                        "ratio": round(current[metric] / previous[metric], 2),
+                    }
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(GROUPS), default=sorted(GROUPS))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--anomaly-rows", type=int, default=10_000_000, help="customer-months for the anomaly scan and cohorts")
+    parser.add_argument("--cdr-replicate", type=int, default=50, help="copies of the customer file for the CDR generator")
+    parser.add_argument("--output", default=os.path.join(HERE, "benchmark_results.json"))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # The app reads its CSVs relative to the working directory.
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+
+    results = {}
+    for group in args.only:
+        for name, fn in GROUPS[group](args).items():
+            results[name] = measure(fn, args.repeat)
+            peak = results[name].get("peak_mb", results[name].get("peak_rss_mb"))
+            print(f"{name:60s} {results[name]['median_s'] * 1000:10.2f} ms {peak:10.2f} MB")
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if "anomaly" in args.only:
+        report["anomaly_noise_flag_rate"] = noise_flag_rate(min(args.anomaly_rows, 2_400_000))
+        print(f"anomaly flag rate on noise: {report['anomaly_noise_flag_rate']}")
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+    report["regressions"] = compare(results, baseline, args.threshold)
+    report["no_baseline"] = sorted(set(results) - set(baseline))
+
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    if args.save_baseline:
+        # Merge, so saving a subset (--only) keeps the other cases' baselines.
+        with open(args.baseline, "w") as fh:
+            json.dump(dict(report, results={**baseline, **results}, regressions=[]), fh, indent=2)
+
+    if args.save_baseline:
+        return 0
+    for regression in report["regressions"]:
+        print(f"REGRESSION {regression['case']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']} (x{regression['ratio']})")
+    if report["no_baseline"]:
+        print(f"NO BASELINE for {len(report['no_baseline'])} case(s) in {args.baseline}: "
+              f"{', '.join(report['no_baseline'])}\n"
+              f"Store one on the reference machine with: python benchmark.py --save-baseline "
+              f"--only {' '.join(args.only)}", file=sys.stderr)
+        return 2
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""Event-level call detail records (CDRs) for load testing.
+
+Every customer in ``customer_data.csv`` becomes a stream of voice calls, data
+sessions and SMS whose 30-day totals match, in expectation, that customer's
+``voice_minutes_30d``, ``data_gb_30d`` and ``sms_count_30d``. Event times
+follow a daily cycle (quiet nights, busy evenings), and most events are on
+the customer's home cell.
+
+Records are generated a batch at a time with numpy: Poisson counts per
+customer and event type for a slice of simulated time, then vectorized
+timestamps, durations, bytes and cells, sorted by time. Customers are split
+across worker processes. Each worker writes its own rolling gzip files
+(``csv`` or the faster binary ``npy`` records) or streams to a socket, and
+can be throttled to a target event rate.
+
+    python cdr_generator.py --out cdr --days 30 --workers 4
+    python cdr_generator.py --out cdr --replicate 1000 --format npy --rate 2000000
+    python cdr_generator.py --socket localhost:9999 --rate 50000
+    python cdr_generator.py rollup --out cdr --usage usage_history_from_cdr.csv
+"""
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+EVENT_TYPES = ['voice', 'data', 'sms']
+VOICE, DATA, SMS = range(3)
+PERIOD_SECONDS = 30 * 86400
+MEAN_CALL_SECONDS = 180
+MEAN_SESSION_SECONDS = 600
+MEAN_SESSION_MB = 40
+N_CELLS = 5000
+HOME_CELL_SHARE = 0.8
+# Relative activity per UTC hour; normalized so the daily mean is 1.
+DIURNAL = np.array([0.2, 0.1, 0.1, 0.1, 0.2, 0.4, 0.7, 1.0, 1.2, 1.2, 1.2, 1.3,
+                    1.4, 1.3, 1.2, 1.2, 1.3, 1.5, 1.7, 1.8, 1.7, 1.4, 0.9, 0.5])
+DIURNAL = DIURNAL / DIURNAL.mean()
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp_ms', '<i8'),
+    ('customer', '<i4'),
+    ('event_type', 'i1'),
+    ('duration_s', '<i4'),
+    ('bytes', '<i8'),
+    ('cell_id', '<i4'),
+])
+CSV_COLUMNS = ['timestamp_ms', 'customer_id', 'event_type', 'duration_s', 'bytes', 'cell_id']
+MANIFEST_NAME = 'manifest.json'
+
+
+class Profiles:
+    """Per-second event rates and home cells for customers ``[start, stop)``.
+
+    With ``replicate`` > 1 the customer file is repeated to reach a larger
+    population; copy ``k`` of customer ``i`` gets index ``k * n + i``.
+    """
+
+    def __init__(self, customers_df, start=0, stop=None, seed=0):
+        n = len(customers_df)
+        stop = n if stop is None else stop
+        self.index = np.arange(start, stop)
+        base = self.index % n
+        voice_calls = customers_df['voice_minutes_30d'].to_numpy(float)[base] * 60 / MEAN_CALL_SECONDS
+        data_sessions = customers_df['data_gb_30d'].to_numpy(float)[base] * 1024 / MEAN_SESSION_MB
+        sms = customers_df['sms_count_30d'].to_numpy(float)[base]
+        self.rates = np.stack([voice_calls, data_sessions, sms], axis=1) / PERIOD_SECONDS
+        self.home_cells = np.random.default_rng(seed).integers(0, N_CELLS, stop)[start:stop]
+
+    def events_per_second(self):
+        return float(self.rates.sum())
+
+
+def generate_slice(profiles, start_ms, seconds, rng):
+    """All events of ``profiles`` in ``[start_ms, start_ms + seconds)``, sorted by time."""
+    # Draw at the peak hourly rate, then thin each event by its hour's activity.
+    peak = DIURNAL.max()
+    counts = rng.poisson(profiles.rates * (seconds * peak))
+    total = int(counts.sum())
+    customer = np.repeat(np.repeat(np.arange(len(profiles.index)), 3), counts.ravel())
+    event_type = np.repeat(np.tile(np.arange(3, dtype=np.int8), len(profiles.index)), counts.ravel())
+    timestamp = start_ms + (rng.random(total) * (seconds * 1000)).astype(np.int64)
+    hour = (timestamp // 3_600_000) % 24
+    keep = rng.random(total) * peak < DIURNAL[hour]
+    customer, event_type, timestamp = customer[keep], event_type[keep], timestamp[keep]
+    order = np.argsort(timestamp, kind='stable')
+    customer, event_type, timestamp = customer[order], event_type[order], timestamp[order]
+
+    n = len(timestamp)
+    records = np.empty(n, dtype=RECORD_DTYPE)
+    records['timestamp_ms'] = timestamp
+    records['customer'] = profiles.index[customer]
+    records['event_type'] = event_type
+    is_voice, is_data = event_type == VOICE, event_type == DATA
+    duration = np.zeros(n, dtype=np.int64)
+    duration[is_voice] = np.ceil(rng.exponential(MEAN_CALL_SECONDS, int(is_voice.sum())))
+    duration[is_data] = np.ceil(rng.exponential(MEAN_SESSION_SECONDS, int(is_data.sum())))
+    records['duration_s'] = duration
+    volume = np.zeros(n, dtype=np.int64)
+    volume[is_data] = rng.exponential(MEAN_SESSION_MB * 2**20, int(is_data.sum()))
+    records['bytes'] = volume
+    roaming = rng.random(n) >= HOME_CELL_SHARE
+    cells = profiles.home_cells[customer]
+    cells[roaming] = rng.integers(0, N_CELLS, int(roaming.sum()))
+    records['cell_id'] = cells
+    return records
+
+
+def encode(records, fmt, customer_ids):
+    """Serialize one batch: CSV text (no header) or a self-describing ``.npy`` block.
+
+    ``customer_ids`` maps a population index to its customer id (see ``population_ids``).
+    """
+    if fmt == 'npy':
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, records, allow_pickle=False)
+        return buffer.getvalue()
+    frame = pd.DataFrame({
+        'timestamp_ms': records['timestamp_ms'],
+        'customer_id': customer_ids[records['customer']],
+        'event_type': np.asarray(EVENT_TYPES)[records['event_type']],
+        'duration_s': records['duration_s'],
+        'bytes': records['bytes'],
+        'cell_id': records['cell_id'],
+    })
+    return frame.to_csv(index=False, header=False).encode()
+
+
+class RollingFileSink:
+    """gzip files of at most about ``max_bytes`` uncompressed bytes each.
+
+    A file is written as ``.tmp`` and renamed when complete, so readers only
+    ever see finished files.
+    """
+
+    def __init__(self, out_dir, prefix, fmt, max_bytes, level=1):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.level = level
+        self.sequence = 0
+        self.file = None
+        self.path = None
+        self.written = 0
+        self.files = []
+
+    def _open(self):
+        suffix = 'csv.gz' if self.fmt == 'csv' else 'npy.gz'
+        self.path = os.path.join(self.out_dir, f"{self.prefix}-{self.sequence:05d}.{suffix}")
+        self.sequence += 1
+        self.file = gzip.open(self.path + '.tmp', 'wb', compresslevel=self.level)
+        if self.fmt == 'csv':
+            self.file.write((','.join(CSV_COLUMNS) + '\n').encode())
+        self.written = 0
+
+    def write(self, payload):
+        if self.file is None:
+            self._open()
+        self.file.write(payload)
+        self.written += len(payload)
+        if self.written >= self.max_bytes:
+            self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            os.replace(self.path + '.tmp', self.path)
+            self.files.append(self.path)
+            self.file = None
+
+
+class SocketSink:
+    """Streams the encoded batches to ``host:port`` or a unix socket path."""
+
+    def __init__(self, address, fmt):
+        if address.startswith('/'):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address)
+        else:
+            host, port = address.rsplit(':', 1)
+            self.sock = socket.create_connection((host, int(port)))
+        if fmt == 'csv':
+            self.sock.sendall((','.join(CSV_COLUMNS) + '\n').encode())
+
+    def write(self, payload):
+        self.sock.sendall(payload)
+
+    def close(self):
+        self.sock.close()
+
+
+class RateLimiter:
+    """Sleeps so that ``events`` emitted so far never run ahead of ``rate`` per second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.perf_counter()
+        self.events = 0
+
+    def wait(self, events):
+        self.events += events
+        if self.rate:
+            ahead = self.events / self.rate - (time.perf_counter() - self.started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def run_worker(worker, config):
+    """Generate and write one worker's share of the customers; returns its totals."""
+    customers_df = pd.read_csv(config['customers'])
+    population = len(customers_df) * config['replicate']
+    bounds = np.linspace(0, population, config['workers'] + 1).astype(int)
+    start, stop = bounds[worker], bounds[worker + 1]
+    profiles = Profiles(customers_df, start, stop, seed=config['seed'])
+    customer_ids = population_ids(customers_df['customer_id'], config['replicate'])
+    rng = np.random.default_rng([config['seed'], worker])
+    limiter = RateLimiter(config['rate'] / config['workers'])
+
+    if config['socket']:
+        sink = SocketSink(config['socket'], config['format'])
+    else:
+        sink = RollingFileSink(config['out'], f"cdr-w{worker:03d}", config['format'], config['max_file_bytes'])
+
+    # Slices sized to about ``batch_events`` events, between one second and one day.
+    slice_seconds = min(86400, max(1, config['batch_events'] / max(profiles.events_per_second(), 1e-9)))
+    cursor = config['start_ms']
+    end = config['start_ms'] + config['days'] * 86_400_000
+    events = payload_bytes = 0
+    started = time.perf_counter()
+    while cursor < end:
+        seconds = min(slice_seconds, (end - cursor) / 1000)
+        records = generate_slice(profiles, cursor, seconds, rng)
+        cursor += int(seconds * 1000)
+        if not len(records):
+            continue
+        payload = encode(records, config['format'], customer_ids)
+        sink.write(payload)
+        events += len(records)
+        payload_bytes += len(payload)
+        limiter.wait(len(records))
+    sink.close()
+    return {'worker': worker, 'events': events, 'bytes': payload_bytes, 'seconds': time.perf_counter() - started}
+
+
+def generate(config):
+    """Run all workers; returns the combined throughput report."""
+    if not config['socket']:
+        os.makedirs(config['out'], exist_ok=True)
+        with open(os.path.join(config['out'], MANIFEST_NAME), 'w') as fh:
+            json.dump(config, fh, indent=2)
+    started = time.perf_counter()
+    if config['workers'] == 1:
+        results = [run_worker(0, config)]
+    else:
+        with Pool(config['workers']) as pool:
+            results = pool.starmap(run_worker, [(w, config) for w in range(config['workers'])])
+    elapsed = time.perf_counter() - started
+    events = sum(r['events'] for r in results)
+    payload = sum(r['bytes'] for r in results)
+    return {
+        'events': events,
+        'seconds': round(elapsed, 3),
+        'events_per_sec': round(events / elapsed),
+        'uncompressed_mb': round(payload / 2**20, 1),
+        'workers': results,
+    }
+
+
+def read_events(path):
+    """Yield record arrays from one CDR file, whichever format it is in."""
+    with gzip.open(path, 'rb') as fh:
+        if path.endswith('.npy.gz'):
+            while fh.peek(1):
+                yield np.lib.format.read_array(fh, allow_pickle=False)
+        else:
+            for chunk in pd.read_csv(fh, chunksize=1_000_000):
+                yield chunk
+
+
+def rollup(out_dir, customers_path=None):
+    """Rebuild ``usage_history`` (one row per customer and month) from a CDR directory."""
+    with open(os.path.join(out_dir, MANIFEST_NAME)) as fh:
+        config = json.load(fh)
+    customers_df = pd.read_csv(customers_path or config['customers'])
+    population = len(customers_df) * config['replicate']
+    first = np.datetime64(config['start_ms'], 'ms').astype('M8[M]')
+    last = np.datetime64(config['start_ms'] + config['days'] * 86_400_000 - 1, 'ms').astype('M8[M]')
+    n_months = int((last - first).astype(int)) + 1
+    cells = population * n_months
+    totals = {name: np.zeros(cells) for name in ('voice_seconds', 'data_bytes', 'sms_count', 'events')}
+    id_index = None
+
+    for path in sorted(glob.glob(os.path.join(out_dir, 'cdr-*.gz'))):
+        for batch in read_events(path):
+            if isinstance(batch, pd.DataFrame):
+                if id_index is None:
+                    id_index = pd.Index(population_ids(customers_df['customer_id'], config['replicate']))
+                customer = id_index.get_indexer(batch['customer_id'])
+                event_type = pd.Categorical(batch['event_type'], categories=EVENT_TYPES).codes
+                batch = {'timestamp_ms': batch['timestamp_ms'].to_numpy(), 'customer': customer,
+                         'event_type': event_type, 'duration_s': batch['duration_s'].to_numpy(),
+                         'bytes': batch['bytes'].to_numpy()}
+            month = (batch['timestamp_ms'].astype('M8[ms]').astype('M8[M]') - first).astype(int)
+            cell = batch['customer'].astype(np.int64) * n_months + month
+            is_voice, is_data, is_sms = (batch['event_type'] == t for t in (VOICE, DATA, SMS))
+            totals['voice_seconds'] += np.bincount(cell[is_voice], batch['duration_s'][is_voice], cells)
+            totals['data_bytes'] += np.bincount(cell[is_data], batch['bytes'][is_data], cells)
+            totals['sms_count'] += np.bincount(cell[is_sms], minlength=cells)
+            totals['events'] += np.bincount(cell, minlength=cells)
+
+    active = np.nonzero(totals['events'])[0]
+    customer, month = np.divmod(active, n_months)
+    months = (first + np.arange(n_months)).astype(str)
+    revenue = customers_df['monthly_revenue'].to_numpy(float)[customer % len(customers_df)]
+    return pd.DataFrame({
+        'customer_id': population_ids(customers_df['customer_id'], config['replicate'])[customer],
+        'month': months[month],
+        'voice_minutes': totals['voice_seconds'][active] / 60,
+        'data_gb': totals['data_bytes'][active] / 2**30,
+        'sms_count': totals['sms_count'][active].astype(int),
+        'revenue': revenue,
+    })
+
+
+def population_ids(customer_ids, replicate):
+    """Customer id per population index; copies after the first get an ``_r<k>`` suffix."""
+    base = np.asarray(customer_ids, dtype=object)
+    return np.concatenate([base] + [base + f"_r{copy}" for copy in range(1, replicate)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', nargs='?', choices=['generate', 'rollup'], default='generate')
+    parser.add_argument('--customers', default='customer_data.csv')
+    parser.add_argument('--out', default='cdr', help='directory for the rolling files (and the rollup input)')
+    parser.add_argument('--socket', help='stream to host:port or a unix socket path instead of files')
+    parser.add_argument('--format', choices=['csv', 'npy'], default='csv')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--start', help='first simulated day (YYYY-MM-DD, UTC); default: --days ago')
+    parser.add_argument('--replicate', type=int, default=1, help='repeat the customer file to scale the population')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--rate', type=float, default=0, help='target events/sec across all workers, 0 = unthrottled')
+    parser.add_argument('--batch-events', type=int, default=200_000)
+    parser.add_argument('--max-file-bytes', type=int, default=256 * 2**20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--usage', default='usage_history_from_cdr.csv', help='rollup output')
+    args = parser.parse_args(argv)
+
+    if args.command == 'rollup':
+        usage = rollup(args.out)
+        usage.to_csv(args.usage, index=False)
+        print(f"Wrote {len(usage):,} customer-months to {args.usage}")
+        return
+
+    if args.start:
+        start = datetime.strptime(args.start, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    else:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=args.days)
+    config = {
+        'customers': os.path.abspath(args.customers),
+        'out': args.out,
+        'socket': args.socket,
+        'format': args.format,
+        'start_ms': int(start.timestamp() * 1000),
+        'days': args.days,
+        'replicate': args.replicate,
+        'workers': max(1, args.workers),
+        'rate': args.rate,
+        'batch_events': args.batch_events,
+        'max_file_bytes': args.max_file_bytes,
+        'seed': args.seed,
+    }
+    report = generate(config)
+    print(json.dumps({k: v for k, v in report.items() if k != 'workers'}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
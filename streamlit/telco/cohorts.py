@@ -0,0 +1,236 @@
+"""Tenure-cohort x month matrices over the usage history.
+
+Customers are assigned to a cohort once, by ``tenure_months``. Tenure is
+counted to the month the customers file was taken (the month of its latest
+``last_payment_date``), which gives each customer's join month. That anchor
+comes from the customers file alone, so appending months and rebuilding from
+the longer history give the same matrices; only a new customers file moves
+it. The long usage
+table is then reduced in one pass: ``np.bincount`` on the flat (cohort,
+month) cell index per metric, and one over (customer, month) cells for the
+active-customer counts. Usage rows from before a customer's join month are
+left out.
+
+``get_cohorts`` caches the matrices per data version. When the usage history
+only gained months after its last one (and the months already in the matrix
+are unchanged), the previous matrices are extended with ``append_month``
+from just the new rows instead of being rebuilt. ``--check-append`` checks
+that this matches a full rebuild on the given files.
+
+    python cohorts.py --view 'Retention %'
+    python cohorts.py --check-append
+"""
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+METRICS = ['revenue', 'data_gb', 'voice_minutes', 'sms_count']
+# Lower tenure bound in months of each cohort, newest customers first.
+TENURE_BANDS = [0, 6, 12, 24, 36, 60]
+COHORTS = ['0-5 mo', '6-11 mo', '12-23 mo', '24-35 mo', '36-59 mo', '60+ mo']
+# View name: (kind, metric).
+VIEWS = {
+    'Retention %': ('retention', None),
+    'Revenue per active customer': ('per_active', 'revenue'),
+    'Total revenue': ('total', 'revenue'),
+    'Data GB per active customer': ('per_active', 'data_gb'),
+    'Voice minutes per active customer': ('per_active', 'voice_minutes'),
+}
+
+
+def month_numbers(labels):
+    """'YYYY-MM' labels as consecutive month numbers."""
+    parts = pd.Series(labels, dtype=str).str.split('-', expand=True).astype(int)
+    return (parts[0] * 12 + parts[1] - 1).to_numpy(dtype=np.int64)
+
+
+def month_label(number):
+    return f"{number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def snapshot_month(customers_df):
+    """'YYYY-MM' the customers file was taken in, or None if it has no ``last_payment_date``."""
+    if 'last_payment_date' not in customers_df:
+        return None
+    return str(customers_df['last_payment_date'].max())[:7]
+
+
+def factorize_months(month_column):
+    """(code per row, sorted month numbers the codes index into)."""
+    codes, labels = pd.factorize(month_column, sort=True)
+    return codes, month_numbers(labels)
+
+
+def month_summary(usage_df):
+    """(month numbers, rows per month, revenue per month), months sorted."""
+    codes, months = factorize_months(usage_df['month'])
+    rows = np.bincount(codes, minlength=len(months))
+    revenue = np.bincount(codes, weights=usage_df['revenue'].to_numpy(dtype=float), minlength=len(months))
+    return months, rows, revenue
+
+
+class CohortMatrix:
+    """Cohort x month totals, active counts and cohort sizes; never modified once built."""
+
+    def __init__(self, customers_df, usage_history_df, as_of=None):
+        """``as_of``: the 'YYYY-MM' month ``tenure_months`` is counted to.
+
+        Defaults to ``snapshot_month``, or else the latest month of the usage history.
+        """
+        tenure = customers_df['tenure_months'].to_numpy()
+        self.customer_ids = pd.Index(customers_df['customer_id'])
+        self.cohort = np.searchsorted(TENURE_BANDS, tenure, side='right') - 1
+        self.sizes = np.bincount(self.cohort, minlength=len(COHORTS))
+        as_of = as_of or snapshot_month(customers_df)
+        if as_of is None:
+            as_of = month_label(month_numbers(usage_history_df['month'].unique()).max())
+        self.as_of = as_of
+        self.join_month = month_numbers([as_of])[0] - tenure
+        self.months = np.empty(0, dtype=np.int64)
+        self.active = np.empty((len(COHORTS), 0))
+        self.totals = {metric: np.empty((len(COHORTS), 0)) for metric in METRICS}
+        # Rows and revenue per month of the input, to tell whether later data only added months.
+        self.month_rows = np.empty(0, dtype=np.int64)
+        self.month_revenue = np.empty(0)
+        self.skipped_rows = 0
+        self._add(usage_history_df)
+
+    def _add(self, usage_df):
+        """Add columns for the months in ``usage_df``, which must all be new."""
+        month_codes, months = factorize_months(usage_df['month'])
+        n = len(months)
+        month_rows = np.bincount(month_codes, minlength=n)
+        month_revenue = np.bincount(month_codes, weights=usage_df['revenue'].to_numpy(dtype=float), minlength=n)
+        customer = self.customer_ids.get_indexer(usage_df['customer_id'])
+        keep = customer >= 0
+        keep[keep] = months[month_codes[keep]] >= self.join_month[customer[keep]]
+        self.skipped_rows += int(len(keep) - keep.sum())
+        customer, month_codes = customer[keep], month_codes[keep]
+
+        cells = self.cohort[customer] * n + month_codes
+        added = {
+            metric: np.bincount(cells, weights=usage_df[metric].to_numpy(dtype=float)[keep],
+                                minlength=len(COHORTS) * n).reshape(len(COHORTS), n)
+            for metric in METRICS
+        }
+        # Each customer counts once per month, however many rows they have in it.
+        present = np.bincount(customer.astype(np.int64) * n + month_codes,
+                              minlength=len(self.customer_ids) * n).reshape(-1, n) > 0
+        active = np.zeros((len(COHORTS), n))
+        np.add.at(active, self.cohort, present)
+
+        order = np.argsort(np.concatenate([self.months, months]), kind='stable')
+        self.months = np.concatenate([self.months, months])[order]
+        self.active = np.hstack([self.active, active])[:, order]
+        self.totals = {metric: np.hstack([self.totals[metric], added[metric]])[:, order] for metric in METRICS}
+        self.month_rows = np.concatenate([self.month_rows, month_rows])[order]
+        self.month_revenue = np.concatenate([self.month_revenue, month_revenue])[order]
+
+    def append_month(self, usage_month_df):
+        """A new matrix that adds the rows of months this one doesn't have yet."""
+        if np.isin(month_numbers(usage_month_df['month'].unique()), self.months).any():
+            raise ValueError("append_month was given rows for a month already in the matrix")
+        matrix = object.__new__(CohortMatrix)
+        matrix.__dict__.update(self.__dict__)
+        matrix._add(usage_month_df)
+        return matrix
+
+    def extends(self, usage_history_df):
+        """True when ``usage_history_df`` is this matrix's input plus later months only."""
+        months, month_rows, month_revenue = month_summary(usage_history_df)
+        old = np.isin(months, self.months)
+        return (old.sum() == len(self.months)
+                and not (months[~old] <= self.months[-1]).any()
+                and np.array_equal(month_rows[old], self.month_rows)
+                and np.allclose(month_revenue[old], self.month_revenue, rtol=1e-12, atol=1e-6))
+
+    def equals(self, other):
+        """True when both matrices hold the same months, anchor and values."""
+        return (self.as_of == other.as_of
+                and np.array_equal(self.months, other.months)
+                and np.array_equal(self.sizes, other.sizes)
+                and np.array_equal(self.active, other.active)
+                and all(np.allclose(self.totals[m], other.totals[m], rtol=1e-12, atol=1e-9) for m in METRICS)
+                and self.skipped_rows == other.skipped_rows)
+
+    def month_labels(self):
+        return [month_label(m) for m in self.months]
+
+    def values(self, view):
+        kind, metric = VIEWS[view]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if kind == 'retention':
+                return 100.0 * self.active / self.sizes[:, None]
+            if kind == 'per_active':
+                return self.totals[metric] / self.active
+        return self.totals[metric]
+
+    def table(self, view):
+        """One of ``VIEWS`` as a cohort x month DataFrame."""
+        return pd.DataFrame(self.values(view), index=pd.Index(COHORTS, name='cohort'), columns=self.month_labels())
+
+    def cohort_of(self, customer_id):
+        return self.cohort[self.customer_ids.get_loc(customer_id)]
+
+
+_latest = {}
+_latest_lock = threading.Lock()
+
+
+@st.cache_resource(max_entries=2, show_spinner="Building cohort matrices...")
+def get_cohorts(_customers_df, _usage_history_df, version):
+    """Cohort matrices for one data version; ``version`` is the cache key.
+
+    If only new months were added to the usage history since the last build
+    for the same customers file, the last matrices are extended instead.
+    Rebuilds for the same customers file keep the last build's anchor.
+    """
+    customers_version = version[0]
+    with _latest_lock:
+        previous = _latest.get(customers_version)
+    if previous is not None and previous.extends(_usage_history_df):
+        codes, months = factorize_months(_usage_history_df['month'])
+        new_rows = ~np.isin(months, previous.months)[codes]
+        matrix = previous.append_month(_usage_history_df[new_rows]) if new_rows.any() else previous
+    else:
+        as_of = previous.as_of if previous is not None else None
+        matrix = CohortMatrix(_customers_df, _usage_history_df, as_of=as_of)
+    with _latest_lock:
+        _latest.clear()
+        _latest[customers_version] = matrix
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', default='customer_data.csv')
+    parser.add_argument('--usage', default='usage_history.csv')
+    parser.add_argument('--view', choices=list(VIEWS), action='append', help='default: every view')
+    parser.add_argument('--check-append', action='store_true',
+                        help='check that appending the last month equals a full rebuild, then exit')
+    args = parser.parse_args()
+    customers_df, usage_history_df = pd.read_csv(args.customers), pd.read_csv(args.usage)
+
+    if args.check_append:
+        last = usage_history_df['month'].max()
+        is_last = (usage_history_df['month'] == last).to_numpy()
+        appended = CohortMatrix(customers_df, usage_history_df[~is_last]).append_month(usage_history_df[is_last])
+        if not appended.equals(CohortMatrix(customers_df, usage_history_df)):
+            raise SystemExit(f"appending {last} differs from a full rebuild")
+        print(f"appending {last} equals a full rebuild (tenure counted to {appended.as_of})")
+        return
+
+    matrix = CohortMatrix(customers_df, usage_history_df)
+    print(pd.Series(matrix.sizes, index=COHORTS, name='customers').to_string())
+    for view in args.view or VIEWS:
+        print(f"\n{view}")
+        print(matrix.table(view).round(1).to_string())
+    if matrix.skipped_rows:
+        print(f"\n{matrix.skipped_rows:,} usage rows before the customer's join month left out")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Data loading for the dashboard.
+
+Kept out of app.py so the launcher (serve.py) can load the data into the same
+caches the app uses before the server starts; functions defined in the app
+script itself would get different cache keys.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+DATA_FILES = ['customer_data.csv', 'usage_history.csv']
+
+
+def data_version():
+    """Size and mtime of the data files; changes whenever they are regenerated or appended to"""
+    return tuple((os.stat(path).st_size, os.stat(path).st_mtime_ns) if os.path.exists(path) else None
+                 for path in DATA_FILES)
+
+
+@st.cache_data(max_entries=2)
+def load_data(version):
+    """Load customer and usage data; ``version`` from ``data_version()`` is the cache key"""
+    # Check if data files exist, if not generate them
+    if not os.path.exists('customer_data.csv') or not os.path.exists('usage_history.csv'):
+        st.info("Generating sample data... This may take a moment.")
+        os.system('python data_generator.py')
+    
+    customers = pd.read_csv('customer_data.csv')
+    usage_history = pd.read_csv('usage_history.csv')
+    
+    # Convert date columns
+    customers['last_payment_date'] = pd.to_datetime(customers['last_payment_date'])
+    customers['last_support_date'] = pd.to_datetime(customers['last_support_date'])
+    
+    return customers, usage_history
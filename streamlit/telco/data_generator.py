@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import numpy as np
 from faker import Faker
@@ -227,9 +228,25 @@ def generate_usage_history(customers_df, months=6):
     return pd.DataFrame(usage_history)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic telco data")
+    parser.add_argument('--mode', choices=['summary', 'cdr'], default='summary',
+                        help="summary: customer_data.csv + usage_history.csv; "
+                             "cdr: event-level records (see cdr_generator.py --help)")
+    # Not --customers: cdr mode passes that (the customer CSV) through to cdr_generator.
+    parser.add_argument('--num-customers', type=int, default=1000)
+    args, rest = parser.parse_known_args()
+
+    if args.mode == 'cdr':
+        # Events are generated from the customer profiles written in summary mode.
+        import cdr_generator
+        cdr_generator.main(rest)
+        raise SystemExit
+    if rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
     # Generate data
     print("Generating telco customer data...")
-    customers = generate_telco_data(1000)
+    customers = generate_telco_data(args.num_customers)
     usage_history = generate_usage_history(customers, 6)
     
     # Save to CSV
@@ -0,0 +1,95 @@
+"""Shared cache of serialized Plotly figures.
+
+Figures are stored as their JSON, keyed by (chart id, customer id, data
+version), in one LRU cache per server process that every session uses. The
+cache is bounded by the total size of the stored JSON (``TELCO_FIGURE_CACHE_MB``,
+default 64). A hit rebuilds the figure from JSON without re-running Plotly
+Express or validating the traces again.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from lazy_imports import go
+
+MAX_BYTES = int(float(os.getenv("TELCO_FIGURE_CACHE_MB", "64")) * 1024 * 1024)
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            spec = self.entries.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return spec
+
+    def put(self, key, spec):
+        size = len(spec)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self.entries[key] = spec
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def figure(self, key, build):
+        """Cached figure for ``key``; ``build()`` makes it on a miss."""
+        spec = self.get(key)
+        if spec is None:
+            fig = build()
+            self.put(key, fig.to_json())
+            return fig
+        # The JSON came from a validated figure, so skip validating it again.
+        return go.Figure(json.loads(spec), _validate=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (
+            f"Figure cache: {stats['entries']} figures, {stats['bytes'] / 2**20:.1f} of "
+            f"{stats['max_bytes'] / 2**20:.0f} MB, hit rate {stats['hit_rate']:.0%} "
+            f"({stats['hits']} hits, {stats['misses']} misses), {stats['evictions']} evictions"
+        )
+
+
+@st.cache_resource
+def get_cache():
+    """The process-wide figure cache."""
+    return FigureCache()
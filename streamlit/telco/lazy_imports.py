@@ -0,0 +1,20 @@
+"""Deferred imports for modules that are slow to load and not needed on every run."""
+import importlib
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+px = LazyModule('plotly.express')
+go = LazyModule('plotly.graph_objects')
+subplots = LazyModule('plotly.subplots')
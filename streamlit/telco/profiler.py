@@ -0,0 +1,145 @@
+"""Opt-in render profiler for the dashboard.
+
+Enable with ``TELCO_PROFILE=1`` or the ``?profile=1`` query parameter. Every
+page and chart block is timed, and charts also record their Plotly JSON
+payload size and serialization time. The results show in a sidebar panel.
+Set ``TELCO_PROFILE_DIR`` to also write a cProfile (or, with
+``TELCO_PROFILER=pyinstrument``, a pyinstrument HTML) dump for each rerun.
+"""
+import cProfile
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+PROFILE_DIR = os.getenv("TELCO_PROFILE_DIR")
+PROFILER = os.getenv("TELCO_PROFILER", "cprofile")
+
+_STATE_KEY = "_profile_blocks"
+
+
+class Block:
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.ms = 0.0
+        self.serialize_ms = 0.0
+        self.payload_bytes = 0
+
+
+class _NullBlock:
+    rows = None
+
+
+def is_enabled():
+    if os.getenv("TELCO_PROFILE") == "1":
+        return True
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+def _blocks():
+    return st.session_state.setdefault(_STATE_KEY, [])
+
+
+@contextmanager
+def block(name, rows=None):
+    """Time a page or chart block; set ``.rows`` inside if known later."""
+    if not is_enabled():
+        yield _NullBlock()
+        return
+    record = Block(name, rows)
+    stack = st.session_state.setdefault("_profile_stack", [])
+    stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.ms = (time.perf_counter() - start) * 1000
+        stack.pop()
+        _blocks().append(record)
+
+
+def page(fn):
+    """Decorator timing a whole ``show_*`` page."""
+
+    def wrapper(*args, **kwargs):
+        with block(f"page:{fn.__name__}", rows=len(args[0]) if args else None):
+            return fn(*args, **kwargs)
+
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+def plotly_chart(fig, **kwargs):
+    """``st.plotly_chart`` that records payload size on the enclosing block."""
+    stack = st.session_state.get("_profile_stack") if is_enabled() else None
+    if stack:
+        start = time.perf_counter()
+        payload = fig.to_json()
+        stack[-1].serialize_ms += (time.perf_counter() - start) * 1000
+        stack[-1].payload_bytes += len(payload)
+    return st.plotly_chart(fig, **kwargs)
+
+
+@contextmanager
+def rerun():
+    """Wrap one script run: reset the block list and optionally dump a profile."""
+    if not is_enabled():
+        yield
+        return
+    st.session_state[_STATE_KEY] = []
+    st.session_state["_profile_stack"] = []
+    profiler = None
+    if PROFILE_DIR:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if PROFILER == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000:06d}"
+            if PROFILER == "pyinstrument":
+                profiler.stop()
+                with open(os.path.join(PROFILE_DIR, f"rerun-{stamp}.html"), "w") as fh:
+                    fh.write(profiler.output_html())
+            else:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(PROFILE_DIR, f"rerun-{stamp}.prof"))
+
+
+def render_panel(notes=()):
+    """Sidebar panel with the blocks timed during this run, plus extra ``notes``."""
+    if not is_enabled():
+        return
+    blocks = _blocks()
+    with st.sidebar.expander("⏱️ Render profile", expanded=False):
+        for note in notes:
+            st.caption(note)
+        if not blocks:
+            st.write("Nothing recorded yet.")
+            return
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "block": [b.name for b in blocks],
+                    "ms": [round(b.ms, 1) for b in blocks],
+                    "serialize ms": [round(b.serialize_ms, 1) for b in blocks],
+                    "rows": [b.rows for b in blocks],
+                    "payload KB": [round(b.payload_bytes / 1024, 1) for b in blocks],
+                }
+            ),
+            hide_index=True,
+        )
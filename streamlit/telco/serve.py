@@ -0,0 +1,90 @@
+"""Start the dashboard with its data and indexes already loaded.
+
+``streamlit run app.py`` does all of its setup on the first page view. This
+launcher does that work first: it imports the plotting modules, loads the
+CSVs, and builds the percentile index, the worklist, the anomaly scan and
+the cohort matrices into the same caches the app reads, and renders the
+landing page once so its charts are in the shared figure cache. Only then does it start the Streamlit
+server in this process. The server's health endpoint (``/_stcore/health``)
+doesn't answer until that is done, so it can be used as the readiness probe.
+
+    python serve.py                       # extra arguments go to `streamlit run`
+    python serve.py --server.port 8080
+    python serve.py --check http://localhost:8501   # exit 0 once the server is ready
+"""
+import os
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def warm():
+    """Load everything the first page view would otherwise load; returns seconds per step."""
+    timings = {}
+
+    def step(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    import anomalies
+    import baselines
+    import cohorts
+    import worklist
+    from data import data_version, load_data
+    from lazy_imports import px
+
+    # The first figure also loads Plotly's trace validators.
+    step("plotly", lambda: px.bar(x=[0], y=[0]).to_json())
+    customers, usage_history = step("load_data", lambda: load_data(data_version()))
+    version = data_version()
+    step("baselines", lambda: baselines.get_baselines(customers, version))
+    step("worklist", lambda: worklist.get_worklist(customers, version))
+    step("anomalies", lambda: anomalies.get_anomalies(usage_history, version))
+    step("cohorts", lambda: cohorts.get_cohorts(customers, usage_history, version))
+    # One headless run of the landing page fills the shared figure cache.
+    step("first_page", render_landing_page)
+    return timings
+
+
+def render_landing_page():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(HERE, "app.py"), default_timeout=120)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py failed during warm-up: {at.exception[0].value}")
+
+
+def check(url, timeout=2.0):
+    """True when the server at ``url`` answers its health endpoint."""
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/_stcore/health", timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def main():
+    if sys.argv[1:2] == ["--check"]:
+        url = sys.argv[2] if len(sys.argv) > 2 else "http://localhost:8501"
+        sys.exit(0 if check(url) else 1)
+
+    # The app reads its CSVs relative to the working directory.
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+    started = time.perf_counter()
+    timings = warm()
+    print(f"Warm in {time.perf_counter() - started:.2f}s: {timings}", flush=True)
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", os.path.join(HERE, "app.py"), *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
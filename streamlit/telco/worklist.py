@@ -0,0 +1,114 @@
+"""High-risk customer worklist with server-side sorting, filtering and paging.
+
+The high-risk customers are extracted once per data version together with a
+precomputed sort order for every sortable column. A page request only builds
+a boolean filter mask, walks the chosen order and slices out one page, so the
+browser never receives more than ``page_size`` rows. CSV export is produced
+in chunks and only when the download button is clicked.
+"""
+import tempfile
+
+import numpy as np
+import streamlit as st
+
+DISPLAY_COLUMNS = ['customer_id', 'first_name', 'last_name', 'plan_type', 'state',
+                   'monthly_revenue', 'satisfaction_score', 'support_tickets_6m', 'overdue_amount']
+SORT_KEYS = ['monthly_revenue', 'overdue_amount', 'satisfaction_score', 'support_tickets_6m', 'customer_id']
+PAGE_SIZES = [25, 50, 100]
+EXPORT_CHUNK_ROWS = 50_000
+
+
+class Worklist:
+    def __init__(self, customers_df):
+        self.frame = customers_df.loc[customers_df['churn_risk'] == 'High', DISPLAY_COLUMNS].reset_index(drop=True)
+        # Stable ascending order per key; descending walks it backwards.
+        self.orders = {key: np.argsort(self.frame[key].to_numpy(), kind='stable') for key in SORT_KEYS}
+        self.plans = self.frame['plan_type'].to_numpy()
+        self.states = self.frame['state'].to_numpy()
+        self.overdue = self.frame['overdue_amount'].to_numpy() > 0
+        self.plan_options = sorted(set(self.plans))
+        self.state_options = sorted(set(self.states))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def select(self, sort_by='monthly_revenue', descending=True, plans=None, states=None, overdue_only=False):
+        """Row positions matching the filters, in sort order."""
+        order = self.orders[sort_by]
+        if descending:
+            order = order[::-1]
+        mask = np.ones(len(self.frame), dtype=bool)
+        if plans:
+            mask &= np.isin(self.plans, plans)
+        if states:
+            mask &= np.isin(self.states, states)
+        if overdue_only:
+            mask &= self.overdue
+        return order[mask[order]]
+
+    def page(self, positions, page, page_size):
+        return self.frame.iloc[positions[page * page_size:(page + 1) * page_size]]
+
+    def iter_csv(self, positions, chunk_rows=EXPORT_CHUNK_ROWS):
+        """CSV text for ``positions``, header first, ``chunk_rows`` rows at a time."""
+        yield self.frame.iloc[:0].to_csv(index=False)
+        for start in range(0, len(positions), chunk_rows):
+            yield self.frame.iloc[positions[start:start + chunk_rows]].to_csv(index=False, header=False)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_worklist(_customers_df, version):
+    """Shared worklist for one data version; ``version`` is the cache key."""
+    return Worklist(_customers_df)
+
+
+def csv_export(worklist, positions):
+    """Callable for ``st.download_button`` that spools the CSV chunk by chunk."""
+
+    def build():
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        for chunk in worklist.iter_csv(positions):
+            spool.write(chunk.encode())
+        spool.seek(0)
+        return spool
+
+    return build
+
+
+def render(worklist):
+    """Filter, sort and page controls plus one page of the worklist."""
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+    with col1:
+        plans = st.multiselect("Plan", worklist.plan_options, key="worklist_plans")
+    with col2:
+        states = st.multiselect("State", worklist.state_options, key="worklist_states")
+    with col3:
+        sort_by = st.selectbox("Sort by", SORT_KEYS, key="worklist_sort")
+    with col4:
+        descending = st.toggle("Descending", value=True, key="worklist_desc")
+        overdue_only = st.checkbox("Overdue only", key="worklist_overdue")
+
+    positions = worklist.select(sort_by, descending, plans, states, overdue_only)
+    if not len(positions):
+        st.info("No high-risk customers match these filters.")
+        return
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col2:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key="worklist_page_size")
+    page_count = -(-len(positions) // page_size)
+    with col1:
+        page = st.number_input("Page", min_value=1, value=1, step=1, key="worklist_page")
+    page = min(page, page_count) - 1
+    with col3:
+        st.caption(f"{len(positions):,} of {len(worklist):,} high-risk customers, page {page + 1:,} of {page_count:,}")
+        st.download_button(
+            "Export CSV",
+            data=csv_export(worklist, positions),
+            file_name="high_risk_customers.csv",
+            mime="text/csv",
+            on_click="ignore",
+            key="worklist_export",
+        )
+
+    st.dataframe(worklist.page(positions, page, page_size), use_container_width=True, hide_index=True)